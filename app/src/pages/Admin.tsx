@@ -20,6 +20,7 @@ interface ValidationResults {
 }
 
 interface VerificationLog {
+  _id?: string;
   timestamp?: string;
   ip_address?: string;
   user_agent?: string;
@@ -52,7 +53,7 @@ const Admin: React.FC = () => {
 
     try {
       const response = await axios.get(
-        `${process.env.REACT_APP_BACKEND_URL}/admin/verification-logs?page=${page}&limit=${limit}`
+        `${process.env.REACT_APP_BACKEND_URL}/admin/verification-logs?page=${page}&limit=${limit}&view=summary`
       );
       if (response.data && response.data.logs) {
         setLogs(response.data.logs);
@@ -74,8 +75,18 @@ const Admin: React.FC = () => {
     }
   };
 
-  const openModal = (log: VerificationLog) => {
+  // The list only carries the table columns; the modal loads the full log.
+  const openModal = async (log: VerificationLog) => {
     setSelectedLog(log);
+    try {
+      const response = await axios.get(
+        `${process.env.REACT_APP_BACKEND_URL}/admin/verification-logs/${log._id}`
+      );
+      // Unless the modal was closed (or another log opened) meanwhile.
+      setSelectedLog((current) => (current === log ? response.data : current));
+    } catch (error) {
+      console.error("Error fetching log details:", error);
+    }
   };
 
   const closeModal = () => {
@@ -0,0 +1,91 @@
+"""Bounded decoding of compressed request bodies (Content-Encoding).
+
+Output is produced incrementally and decoding stops as soon as it would pass
+either the absolute size limit or ``max_ratio`` times the compressed size,
+so a small zip bomb never gets fully inflated.
+"""
+import io
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip/deflate work without it
+    zstandard = None
+
+_DECODE_ERRORS = (zlib.error, zstandard.ZstdError) if zstandard is not None else (zlib.error,)
+
+_CHUNK = 64 * 1024
+
+
+class UnsupportedEncoding(ValueError):
+    pass
+
+
+class CorruptBody(ValueError):
+    pass
+
+
+class BodyTooLarge(ValueError):
+    pass
+
+
+def supported_encodings():
+    return ('gzip', 'deflate', 'zstd') if zstandard is not None else ('gzip', 'deflate')
+
+
+def _inflate(data, wbits, limit):
+    decompressor = zlib.decompressobj(wbits)
+    out = bytearray()
+    pending = data
+    while pending:
+        out += decompressor.decompress(pending, limit + 1 - len(out))
+        if len(out) > limit:
+            raise BodyTooLarge
+        pending = decompressor.unconsumed_tail
+    out += decompressor.flush()
+    if len(out) > limit:
+        raise BodyTooLarge
+    if not decompressor.eof:
+        raise CorruptBody("truncated body")
+    return bytes(out)
+
+
+def _zstd(data, limit):
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data))
+    out = bytearray()
+    while True:
+        chunk = reader.read(min(_CHUNK, limit + 1 - len(out)))
+        if not chunk:
+            return bytes(out)
+        out += chunk
+        if len(out) > limit:
+            raise BodyTooLarge
+
+
+def decompress(data, encoding, max_size, max_ratio):
+    """Decode ``data`` for a Content-Encoding header value ('' / identity pass through)."""
+    encodings = [e.strip().lower() for e in (encoding or '').split(',') if e.strip()]
+    limit = max(len(data), 1) * max_ratio
+    # Encodings are listed in the order they were applied.
+    for name in reversed(encodings):
+        if name == 'identity':
+            continue
+        step_limit = min(max_size, limit)
+        try:
+            if name in ('gzip', 'x-gzip'):
+                data = _inflate(data, 16 + zlib.MAX_WBITS, step_limit)
+            elif name == 'deflate':
+                # HTTP "deflate" is meant to be zlib-wrapped, but some clients send raw deflate.
+                try:
+                    data = _inflate(data, zlib.MAX_WBITS, step_limit)
+                except (zlib.error, CorruptBody):
+                    data = _inflate(data, -zlib.MAX_WBITS, step_limit)
+            elif name == 'zstd' and zstandard is not None:
+                data = _zstd(data, step_limit)
+            else:
+                raise UnsupportedEncoding(name)
+        except _DECODE_ERRORS as e:
+            raise CorruptBody(str(e)) from e
+    if len(data) > max_size:
+        raise BodyTooLarge
+    return data
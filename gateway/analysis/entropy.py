@@ -0,0 +1,82 @@
+"""Shannon entropy over binned behavior distributions.
+
+Values are counted into fixed bin edges with one ``searchsorted`` +
+``bincount`` pass. Histograms over the same edges can be merged, so counts
+built chunk by chunk during a session give the same entropy as one batch
+pass over the whole session.
+"""
+import numpy as np
+
+# Cursor speed in px/s, log-spaced because most movement is slow.
+SPEED_EDGES = np.concatenate(([0.0], np.geomspace(10, 10_000, 16), [np.inf]))
+# Movement heading in radians, 16 compass sectors.
+ANGLE_EDGES = np.linspace(-np.pi, np.pi, 17)
+# Inter-event intervals in ms.
+INTERVAL_EDGES = np.concatenate(([0.0], np.geomspace(10, 5_000, 16), [np.inf]))
+
+
+def shannon_entropy(counts):
+    """Entropy in bits of a vector of bin counts; 0 for an empty histogram."""
+    counts = np.asarray(counts)
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    p = counts[counts > 0] / total
+    return float(-(p * np.log2(p)).sum()) + 0.0  # + 0.0 turns -0.0 into 0.0
+
+
+class Histogram:
+    """Counts over fixed bin edges; values outside the edges land in the end bins."""
+
+    def __init__(self, edges, counts=None):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        if self.edges.ndim != 1 or self.edges.size < 2 or np.any(np.diff(self.edges) <= 0):
+            raise ValueError("bin edges must be a strictly increasing 1-d sequence of at least 2 values")
+        bins = self.edges.size - 1
+        self.counts = np.zeros(bins, dtype=np.int64) if counts is None else np.array(counts, dtype=np.int64)
+        if self.counts.shape != (bins,):
+            raise ValueError(f"expected {bins} counts, got {self.counts.shape}")
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        bins = np.searchsorted(self.edges, values, side='right') - 1
+        np.clip(bins, 0, self.counts.size - 1, out=bins)
+        self.counts += np.bincount(bins, minlength=self.counts.size)
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("cannot merge histograms with different bin edges")
+        self.counts += other.counts
+        return self
+
+    def entropy(self):
+        return shannon_entropy(self.counts)
+
+    def to_dict(self):
+        return {'edges': self.edges.tolist(), 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['edges'], data['counts'])
+
+
+def binned_entropy(values, edges):
+    return Histogram(edges).add(values).entropy()
+
+
+def speed_entropy(speeds, edges=SPEED_EDGES):
+    return binned_entropy(speeds, edges)
+
+
+def angle_entropy(angles, edges=ANGLE_EDGES):
+    return binned_entropy(angles, edges)
+
+
+def interval_entropy(intervals, edges=INTERVAL_EDGES):
+    return binned_entropy(intervals, edges)
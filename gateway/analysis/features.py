@@ -0,0 +1,163 @@
+"""Model feature extraction.
+
+Extractors register themselves with ``@extractor``, declaring the
+BehaviorFrame attributes they read and the columns they produce. A
+``FeaturePipeline`` runs the enabled extractors over one frame and returns a
+fixed-width float32 vector; the same pipeline is used by /verify and by
+offline jobs, so serving and training always see the same columns.
+
+Bump ``SCHEMA_VERSION`` whenever an existing column changes meaning.
+"""
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+from analysis import history
+from analysis.frame import CHANNELS, BehaviorFrame
+from analysis.summaries import summary
+
+SCHEMA_VERSION = 1
+
+Extractor = namedtuple('Extractor', 'name inputs columns compute')
+
+REGISTRY = {}
+
+# BehaviorFrame attribute -> userBehaviorData key, for projecting stored payloads.
+_PAYLOAD_KEYS = {attribute: key for attribute, key, _ in CHANNELS}
+_PAYLOAD_KEYS.update({
+    'time_on_page': 'timeOnPage',
+    'idle_time': 'idleTime',
+    'zoom_level': 'zoomLevel',
+    'browser_fingerprint': 'browserFingerprint',
+    'device_info': 'deviceInfo',
+    'geo_location': 'geoLocation',
+    'device_orientation': 'deviceOrientation',
+})
+
+
+def extractor(name, inputs, columns):
+    """Register ``compute(frame) -> sequence of len(columns) numbers``."""
+    def register(compute):
+        if name in REGISTRY:
+            raise ValueError(f"feature extractor {name!r} is already registered")
+        REGISTRY[name] = Extractor(name, tuple(inputs), tuple(columns), compute)
+        return compute
+    return register
+
+
+class FeaturePipeline:
+    """The enabled extractors, in registration order, and their column schema."""
+
+    def __init__(self, enabled=None):
+        names = list(REGISTRY) if enabled is None else list(enabled)
+        unknown = [name for name in names if name not in REGISTRY]
+        if unknown:
+            raise ValueError(f"unknown feature extractors: {', '.join(unknown)}")
+        self.extractors = [REGISTRY[name] for name in REGISTRY if name in names]
+        self.columns = tuple(f'{e.name}.{column}' for e in self.extractors for column in e.columns)
+        self.width = len(self.columns)
+        # Positions of the columns computed from the request alone, i.e. all but the per-IP/fingerprint
+        # history, which changes with every request.
+        self.behavior_columns = np.array([i for i, column in enumerate(self.columns)
+                                          if not column.startswith('history.')], dtype=np.intp)
+        digest = hashlib.sha1('\n'.join(self.columns).encode()).hexdigest()[:8]
+        self.schema_id = f'v{SCHEMA_VERSION}-{digest}'
+
+    @property
+    def inputs(self):
+        return sorted({attribute for e in self.extractors for attribute in e.inputs})
+
+    @property
+    def payload_fields(self):
+        """userBehaviorData keys the enabled extractors need."""
+        return sorted({_PAYLOAD_KEYS[attribute] for attribute in self.inputs if attribute in _PAYLOAD_KEYS})
+
+    def schema(self):
+        return {'id': self.schema_id, 'version': SCHEMA_VERSION, 'columns': list(self.columns)}
+
+    def extract(self, frame, out=None):
+        vector = np.empty(self.width, dtype=np.float32) if out is None else out
+        start = 0
+        for e in self.extractors:
+            stop = start + len(e.columns)
+            vector[start:stop] = e.compute(frame)
+            start = stop
+        return np.nan_to_num(vector, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+
+    def extract_many(self, payloads):
+        """Feature matrix for stored userBehaviorData payloads (offline jobs).
+
+        The ``history`` columns come from the live per-IP/fingerprint counts at
+        request time, which a stored payload does not carry: they are zero
+        unless a BehaviorFrame with ``history`` set is passed. Train on the
+        ``model_features`` stored with each log (inference.train) rather than
+        on these rows, or the model sees history that serving never has.
+        """
+        payloads = list(payloads)
+        matrix = np.empty((len(payloads), self.width), dtype=np.float32)
+        for row, payload in zip(matrix, payloads):
+            self.extract(payload if isinstance(payload, BehaviorFrame) else BehaviorFrame(payload), out=row)
+        return matrix
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) else 0
+
+
+@extractor('session', inputs=('time_on_page', 'idle_time', 'zoom_level'),
+           columns=('time_on_page', 'idle_time', 'zoom_level'))
+def _session(frame):
+    return _number(frame.time_on_page), _number(frame.idle_time), _number(frame.zoom_level)
+
+
+@extractor('counts', inputs=[attribute for attribute, _, _ in CHANNELS],
+           columns=[attribute for attribute, _, _ in CHANNELS])
+def _counts(frame):
+    return [len(channel) for channel in frame.channels().values()]
+
+
+@extractor('mouse', inputs=('cursor',),
+           columns=('total_distance', 'total_time', 'average_speed', 'max_speed', 'acceleration',
+                    'speed_entropy', 'angle_entropy'))
+def _mouse(frame):
+    metrics = summary(frame.cursor)
+    return (metrics['total_distance'], metrics['total_time'], metrics['average_speed'], metrics['max_speed'],
+            metrics['acceleration'], metrics['entropy'], metrics['angle_entropy'])
+
+
+@extractor('keyboard', inputs=('keystroke',),
+           columns=('average_interval', 'interval_entropy', 'average_dwell', 'dwell_std',
+                    'average_flight', 'flight_std', 'rhythm_regularity'))
+def _keyboard(frame):
+    metrics = summary(frame.keystroke)
+    return (metrics['average_interval'], metrics['entropy'], metrics['average_dwell'], metrics['dwell_std'],
+            metrics['average_flight'], metrics['flight_std'], metrics['rhythm_regularity'])
+
+
+@extractor('scroll', inputs=('scroll',), columns=('average_speed', 'direction_changes'))
+def _scroll(frame):
+    metrics = summary(frame.scroll)
+    return metrics['average_speed'], metrics['direction_changes']
+
+
+@extractor('attention', inputs=('window_focus', 'page_visibility', 'copy_paste'),
+           columns=('blur_count', 'hidden_count', 'paste_count'))
+def _attention(frame):
+    return (
+        summary(frame.window_focus)['count'],
+        summary(frame.page_visibility)['count'],
+        summary(frame.copy_paste)['count'],
+    )
+
+
+@extractor('form', inputs=('form_interaction', 'hover'), columns=('field_time', 'hover_time'))
+def _form(frame):
+    return summary(frame.form_interaction)['total'], summary(frame.hover)['total']
+
+
+@extractor('history', inputs=('history',), columns=history.COLUMNS)
+def _history(frame):
+    # Set by /verify from the HistoryStore; stored payloads have none.
+    values = getattr(frame, 'history', None) or history.EMPTY
+    return [values[column] for column in history.COLUMNS]
@@ -0,0 +1,181 @@
+"""Columnar view of a userBehaviorData payload.
+
+``BehaviorFrame`` is built once per request. Each list-valued channel becomes
+a ``Channel`` whose columns are typed NumPy arrays (``frame.cursor.x``,
+``frame.cursor.t``, ...). A column is decoded the first time it is read and
+cached on the channel, so channels nobody looks at cost nothing.
+
+A channel may also arrive already columnar (``ColumnarEvents``, e.g. from
+the binary wire format); its arrays are then used as-is.
+"""
+from collections.abc import Sequence
+
+import numpy as np
+
+from analysis.timestamps import decode_timestamps
+
+TIME = 'time'
+TEXT = 'text'
+
+# attribute, payload key, ((column, event field, dtype), ...)
+CHANNELS = (
+    ('cursor', 'cursorData', (
+        ('x', 'x', np.float64), ('y', 'y', np.float64), ('t', 'timestamp', TIME))),
+    ('click', 'clickData', (
+        ('element', 'element', TEXT), ('x', 'x', np.float64), ('y', 'y', np.float64),
+        ('t', 'timestamp', TIME))),
+    ('keystroke', 'keystrokeData', (
+        ('key', 'key', TEXT), ('duration', 'duration', np.float64),
+        ('key_press_duration', 'keyPressDuration', np.float64))),
+    ('scroll', 'scrollData', (
+        ('scroll_top', 'scrollTop', np.float64), ('scroll_speed', 'scrollSpeed', np.float64),
+        ('direction', 'direction', TEXT), ('t', 'timestamp', TIME))),
+    ('form_interaction', 'formInteraction', (
+        ('field_name', 'fieldName', TEXT), ('time_spent', 'timeSpent', np.float64))),
+    ('hover', 'hoverData', (
+        ('element', 'element', TEXT), ('duration', 'duration', np.float64))),
+    ('window_focus', 'windowFocusData', (
+        ('focused', 'focused', np.bool_), ('t', 'timestamp', TIME))),
+    ('copy_paste', 'copyPasteData', (
+        ('action', 'action', TEXT), ('field', 'field', TEXT), ('t', 'timestamp', TIME))),
+    ('resize', 'resizeData', (
+        ('width', 'width', np.float64), ('height', 'height', np.float64), ('t', 'timestamp', TIME))),
+    ('page_visibility', 'pageVisibility', (
+        ('visible', 'visible', np.bool_), ('t', 'timestamp', TIME))),
+    ('touch', 'touchData', (
+        ('x', 'x', np.float64), ('y', 'y', np.float64), ('pressure', 'pressure', np.float64),
+        ('t', 'timestamp', TIME))),
+    ('drag_drop', 'dragDropData', (
+        ('element', 'element', TEXT), ('start_x', 'startX', np.float64), ('start_y', 'startY', np.float64),
+        ('end_x', 'endX', np.float64), ('end_y', 'endY', np.float64), ('t', 'timestamp', TIME))),
+)
+CHANNEL_COLUMNS = {key: columns for _, key, columns in CHANNELS}
+
+
+def present_key(column):
+    """``ColumnarEvents`` key of the optional bool array marking which events have a flag ``column``.
+
+    A flag column holds False for a missing flag; when some are missing, this
+    array tells them apart.
+    """
+    return f'{column}.present'
+
+
+def format_timestamps(t):
+    """int64 epoch ms -> ``toISOString()`` strings."""
+    return np.datetime_as_string(np.asarray(t).astype('datetime64[ms]'), unit='ms', timezone='UTC').tolist()
+
+
+class ColumnarEvents(Sequence):
+    """A channel given as column arrays instead of a list of event dicts.
+
+    ``arrays`` maps channel column names (``x``, ``t``, ...) to arrays of
+    length ``count``. Indexing or iterating materializes the event dicts on
+    first use, so code that expects the JSON shape (persistence) still works.
+    """
+
+    def __init__(self, key, count, arrays):
+        self.key = key
+        self.count = count
+        self.arrays = arrays
+        self._events = None
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if self._events is None:
+            self._events = self._materialize()
+        return self._events[index]
+
+    def _materialize(self):
+        values = []
+        for column, field, dtype in CHANNEL_COLUMNS[self.key]:
+            array = self.arrays.get(column)
+            if array is None:
+                values.append((field, [None] * self.count))
+            elif dtype is TIME:
+                values.append((field, format_timestamps(array)))
+            elif dtype is TEXT:
+                values.append((field, list(array)))
+            else:
+                present = self.arrays.get(present_key(column))
+                array = np.asarray(array).tolist()
+                if present is not None:
+                    array = [value if has else None for value, has in zip(array, present.tolist())]
+                values.append((field, array))
+        return [dict(zip((field for field, _ in values), row)) for row in zip(*(v for _, v in values))]
+
+
+class Channel:
+    """Struct-of-arrays for one behavior channel.
+
+    Numeric columns are float64 (missing values become NaN), flags are bool,
+    ``t`` is int64 epoch milliseconds and text columns stay Python lists.
+    """
+
+    def __init__(self, payload_key, events, columns):
+        self.payload_key = payload_key
+        self.events = events
+        self.columns = tuple(column for column, _, _ in columns)
+        self._fields = {column: (field, dtype) for column, field, dtype in columns}
+        self._derived = {}
+        if isinstance(events, ColumnarEvents):
+            for column, array in events.arrays.items():
+                if column in self._fields:
+                    setattr(self, column, array)
+
+    def __len__(self):
+        return len(self.events)
+
+    def __getattr__(self, column):
+        # Only called when the column has not been decoded yet.
+        fields = self.__dict__.get('_fields', {})
+        if column not in fields:
+            raise AttributeError(f"{self.__class__.__name__} {self.__dict__.get('payload_key')!r} has no column {column!r}")
+        field, dtype = fields[column]
+        values = [event.get(field) for event in self.events]
+        if dtype is TIME:
+            decoded = decode_timestamps(values)
+        elif dtype is TEXT:
+            decoded = values
+        else:
+            decoded = np.array(values, dtype=dtype)
+        setattr(self, column, decoded)
+        return decoded
+
+    def take(self, index):
+        """A new channel holding only the events at ``index`` (sorted positions)."""
+        index = np.asarray(index, dtype=np.intp)
+        arrays = {}
+        for column in self.columns:
+            values = getattr(self, column)
+            arrays[column] = values[index] if isinstance(values, np.ndarray) else [values[i] for i in index]
+        columns = [(column, field, dtype) for column, (field, dtype) in self._fields.items()]
+        return Channel(self.payload_key, ColumnarEvents(self.payload_key, index.size, arrays), columns)
+
+    def derive(self, name, compute):
+        """Return ``compute(self)``, computing it only once per channel."""
+        if name not in self._derived:
+            self._derived[name] = compute(self)
+        return self._derived[name]
+
+
+class BehaviorFrame:
+    """Everything the verify pipeline reads from one userBehaviorData payload."""
+
+    def __init__(self, payload):
+        self.payload = payload
+        for attribute, key, columns in CHANNELS:
+            setattr(self, attribute, Channel(key, payload.get(key) or [], columns))
+
+        self.time_on_page = payload.get('timeOnPage')
+        self.idle_time = payload.get('idleTime')
+        self.zoom_level = payload.get('zoomLevel')
+        self.browser_fingerprint = payload.get('browserFingerprint')
+        self.device_info = payload.get('deviceInfo')
+        self.geo_location = payload.get('geoLocation')
+        self.device_orientation = payload.get('deviceOrientation')
+
+    def channels(self):
+        return {attribute: getattr(self, attribute) for attribute, _, _ in CHANNELS}
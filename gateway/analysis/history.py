@@ -0,0 +1,254 @@
+"""Per-IP and per-fingerprint verification history.
+
+Every decided /verify call is counted against its IP and its browser
+fingerprint in one-minute buckets covering the last hour; IPs also remember
+which fingerprints they were seen with. ``snapshot`` reads the current
+values for the ``history`` feature extractor in constant time per request:
+running hourly totals, and for the last minute the usual sliding-window
+estimate (this minute plus the part of the previous one still in range).
+
+The in-memory layer is this process's view. Increments are also queued and
+a background thread writes them to the ``behavior_history`` collection as
+batched ``$inc`` upserts, one document per key and minute. The same thread
+seeds keys this process has not seen before with their last hour from
+Mongo, which covers other workers and restarts.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from metrics import metrics
+
+BUCKET_SECONDS = 60
+WINDOW_BUCKETS = 60
+MAX_FINGERPRINTS_PER_IP = 1000
+
+COLUMNS = ('ip_attempts_minute', 'ip_attempts_hour', 'ip_bot_ratio', 'ip_fingerprints',
+           'fingerprint_attempts_minute', 'fingerprint_attempts_hour', 'fingerprint_bot_ratio')
+EMPTY = dict.fromkeys(COLUMNS, 0.0)
+
+
+class _Series:
+    """Minute buckets of [attempts, bots] for one key, oldest first, with running totals."""
+
+    __slots__ = ('buckets', 'attempts', 'bots', 'fingerprints', 'expired')
+
+    def __init__(self):
+        self.buckets = deque()
+        self.attempts = 0
+        self.bots = 0
+        self.fingerprints = None
+        self.expired = None
+
+    def expire(self, bucket):
+        if bucket == self.expired:
+            return
+        self.expired = bucket
+        while self.buckets and self.buckets[0][0] <= bucket - WINDOW_BUCKETS:
+            _, attempts, bots = self.buckets.popleft()
+            self.attempts -= attempts
+            self.bots -= bots
+        if self.fingerprints:
+            for fingerprint in [f for f, seen in self.fingerprints.items() if seen <= bucket - WINDOW_BUCKETS]:
+                del self.fingerprints[fingerprint]
+
+    def add(self, bucket, attempts, bots):
+        if self.buckets and self.buckets[-1][0] == bucket:
+            self.buckets[-1][1] += attempts
+            self.buckets[-1][2] += bots
+        elif not self.buckets or self.buckets[-1][0] < bucket:
+            self.buckets.append([bucket, attempts, bots])
+        else:  # an older bucket, when seeding from Mongo
+            merged = {b: [b, a, n] for b, a, n in self.buckets}
+            entry = merged.setdefault(bucket, [bucket, 0, 0])
+            entry[1] += attempts
+            entry[2] += bots
+            self.buckets = deque(sorted(merged.values()))
+        self.attempts += attempts
+        self.bots += bots
+
+    def see(self, fingerprint, bucket):
+        if self.fingerprints is None:
+            self.fingerprints = {}
+        if fingerprint in self.fingerprints or len(self.fingerprints) < MAX_FINGERPRINTS_PER_IP:
+            self.fingerprints[fingerprint] = max(bucket, self.fingerprints.get(fingerprint, bucket))
+
+    def last_minute(self, now):
+        bucket = int(now // BUCKET_SECONDS)
+        current = previous = 0
+        for b, attempts, _ in reversed(self.buckets):
+            if b == bucket:
+                current = attempts
+            elif b == bucket - 1:
+                previous = attempts
+            else:
+                break
+        return current + previous * (1 - (now % BUCKET_SECONDS) / BUCKET_SECONDS)
+
+    def bot_ratio(self):
+        return self.bots / self.attempts if self.attempts else 0.0
+
+
+class HistoryStore:
+    """Bounded LRU of per-key series plus the queue of increments not yet in Mongo."""
+
+    def __init__(self, collection=None, max_keys=100_000, flush_interval=5.0):
+        self.collection = collection
+        self.max_keys = max_keys
+        self.flush_interval = flush_interval
+        self._series = OrderedDict()
+        self._pending = {}
+        self._unseeded = set()
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self._series)
+
+    def _get(self, kind, key, bucket, create):
+        series = self._series.get((kind, key))
+        if series is None:
+            if not create:
+                return None
+            series = self._series[kind, key] = _Series()
+            self._unseeded.add((kind, key))
+            while len(self._series) > self.max_keys:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end((kind, key))
+        series.expire(bucket)
+        return series
+
+    def snapshot(self, ip, fingerprint, now=None):
+        """The history feature values before the current request."""
+        now = time.time() if now is None else now
+        bucket = int(now // BUCKET_SECONDS)
+        values = dict(EMPTY)
+        with self._lock:
+            by_ip = self._get('ip', ip, bucket, create=False) if ip else None
+            by_fingerprint = self._get('fingerprint', fingerprint, bucket, create=False) if fingerprint else None
+            if by_ip is not None:
+                values.update(ip_attempts_minute=by_ip.last_minute(now), ip_attempts_hour=by_ip.attempts,
+                              ip_bot_ratio=by_ip.bot_ratio(), ip_fingerprints=len(by_ip.fingerprints or ()))
+            if by_fingerprint is not None:
+                values.update(fingerprint_attempts_minute=by_fingerprint.last_minute(now),
+                              fingerprint_attempts_hour=by_fingerprint.attempts,
+                              fingerprint_bot_ratio=by_fingerprint.bot_ratio())
+        return values
+
+    def record(self, ip, fingerprint, is_bot, now=None):
+        """Count one decided verification."""
+        now = time.time() if now is None else now
+        bucket = int(now // BUCKET_SECONDS)
+        bots = int(bool(is_bot))
+        with self._lock:
+            for kind, key in (('ip', ip), ('fingerprint', fingerprint)):
+                if not key:
+                    continue
+                series = self._get(kind, key, bucket, create=True)
+                series.add(bucket, 1, bots)
+                pending = self._pending.setdefault((kind, key, bucket), [0, 0, set()])
+                pending[0] += 1
+                pending[1] += bots
+                if kind == 'ip' and fingerprint:
+                    series.see(fingerprint, bucket)
+                    pending[2].add(fingerprint)
+        if self.collection is not None:
+            self._ensure_flushing()
+
+    def _ensure_flushing(self):
+        # Threads do not survive fork; a preloaded app starts its flusher in each worker.
+        if self._pid == os.getpid() and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run, name='history-flusher', daemon=True)
+                self._flusher.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                metrics.incr('history.flush_errors')
+                print("Error flushing behavior history:", e)
+
+    def flush(self):
+        """Seed newly seen keys from Mongo, then write queued increments; returns the number written."""
+        collection = self.collection() if callable(self.collection) else self.collection
+        with self._lock:
+            unseeded, self._unseeded = self._unseeded, set()
+            pending, self._pending = self._pending, {}
+        try:
+            if unseeded:
+                self._seed(collection, unseeded)
+                unseeded = ()
+            requests = []
+            for (kind, key, bucket), (attempts, bots, fingerprints) in pending.items():
+                update = {'$inc': {'attempts': attempts, 'bots': bots}}
+                if fingerprints:
+                    update['$addToSet'] = {'fingerprints': {'$each': sorted(fingerprints)}}
+                requests.append(UpdateOne({'kind': kind, 'key': key, 'bucket': _bucket_time(bucket)}, update,
+                                          upsert=True))
+            if requests:
+                collection.bulk_write(requests, ordered=False)
+        except Exception:
+            # Nothing was written: queue the increments again, and the keys too if seeding did not finish.
+            self._requeue(pending, unseeded)
+            raise
+        if not requests:
+            return 0
+        metrics.incr('history.flushed', len(requests))
+        return len(requests)
+
+    def _requeue(self, pending, unseeded=()):
+        with self._lock:
+            # Keys seeded by now (or evicted) are not seeded again.
+            self._unseeded |= {key for key in unseeded if key in self._series}
+            for slot, (attempts, bots, fingerprints) in pending.items():
+                queued = self._pending.setdefault(slot, [0, 0, set()])
+                queued[0] += attempts
+                queued[1] += bots
+                queued[2] |= fingerprints
+
+    def _seed(self, collection, keys):
+        # Runs before the queued increments are written, so Mongo holds none of them yet and nothing
+        # is counted twice.
+        since = _bucket_time(int(time.time() // BUCKET_SECONDS) - WINDOW_BUCKETS + 1)
+        found = []
+        for kind in ('ip', 'fingerprint'):
+            names = [key for k, key in keys if k == kind]
+            if not names:
+                continue
+            documents = list(collection.find(
+                {'kind': kind, 'key': {'$in': names}, 'bucket': {'$gte': since}},
+                {'_id': 0, 'key': 1, 'bucket': 1, 'attempts': 1, 'bots': 1, 'fingerprints': 1}))
+            found.append((kind, documents))
+        # Applied only once every read has succeeded, so a failed seed can be retried without counting twice.
+        with self._lock:
+            for kind, documents in found:
+                for document in documents:
+                    series = self._series.get((kind, document['key']))
+                    if series is None:
+                        continue
+                    bucket = _bucket_index(document['bucket'])
+                    series.add(bucket, document.get('attempts', 0), document.get('bots', 0))
+                    for fingerprint in document.get('fingerprints') or ():
+                        series.see(fingerprint, bucket)
+
+
+def _bucket_time(bucket):
+    return datetime(1970, 1, 1) + timedelta(seconds=bucket * BUCKET_SECONDS)
+
+
+def _bucket_index(moment):
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((moment - datetime(1970, 1, 1)).total_seconds() // BUCKET_SECONDS)
@@ -0,0 +1,71 @@
+"""Vectorized keystroke dynamics.
+
+The client reports, per keystroke, ``keyPressDuration`` (how long the key was
+held) and ``duration``, which the original analyzer summed to rebuild key
+press times: keystroke i + 1 is pressed ``duration[i]`` ms after keystroke i.
+Differencing those rebuilt timestamps gives ``duration`` back, so latencies
+are read off directly instead of re-summing a prefix per keystroke.
+
+The Login page currently measures ``duration`` from keydown to keyup, so it
+is a hold time as well, not the gap to the next keystroke, and no keydown
+timestamps are sent to recover that gap. Until the client reports them the
+latency, flight and entropy figures describe hold times; they are recorded
+and fed to the model, but /verify does not fail a check on them.
+"""
+import numpy as np
+
+from analysis.entropy import INTERVAL_EDGES, Histogram
+from analysis.stats import RunningStats
+
+
+class KeystrokeAccumulator:
+    """KeyboardMetrics for keystrokes fed in one or more chunks.
+
+    Press-to-press latency between keystroke i and i + 1 (digraph latency) is
+    ``duration[i]``, and flight, the gap between releasing key i and pressing
+    key i + 1, is that latency minus ``keyPressDuration[i]``. Flight is
+    negative when keys overlap, which is normal for fast typists. The last
+    keystroke of a chunk only gets a latency once the next one arrives.
+    """
+
+    def __init__(self, interval_edges=INTERVAL_EDGES):
+        self.total_keystrokes = 0
+        self.dwell = RunningStats()
+        self.latency = RunningStats()
+        self.flight = RunningStats()
+        self.interval_histogram = Histogram(interval_edges)
+        self._pending = None
+
+    def update(self, keystroke):
+        duration, key_press_duration = keystroke.duration, keystroke.key_press_duration
+        if not len(duration):
+            return self
+        self.total_keystrokes += len(duration)
+        self.dwell.add(key_press_duration)
+
+        if self._pending is not None:
+            duration = np.concatenate(([self._pending[0]], duration))
+            key_press_duration = np.concatenate(([self._pending[1]], key_press_duration))
+        self._pending = (duration[-1], key_press_duration[-1])
+
+        latency = duration[:-1]
+        self.latency.add(latency)
+        self.flight.add(latency - key_press_duration[:-1])
+        self.interval_histogram.add(latency)
+        return self
+
+    def result(self):
+        average_interval = self.latency.mean if self.latency.count else 0.0
+        # 1 for a perfectly even rhythm, tending to 0 as intervals vary more.
+        variation = self.latency.std / average_interval if average_interval > 0 else 0.0
+        return {
+            'total_keystrokes': self.total_keystrokes,
+            'average_interval': average_interval,
+            'entropy': self.interval_histogram.entropy(),
+            'average_dwell': self.dwell.mean,
+            'dwell_std': self.dwell.std,
+            'average_flight': self.flight.mean,
+            'flight_std': self.flight.std,
+            'rhythm_regularity': 1.0 / (1.0 + variation) if self.latency.count else 0.0,
+        }
+
@@ -0,0 +1,131 @@
+"""Bounding how many events reach analysis and storage.
+
+Before analysis every channel gets
+
+* exact dedup: in timestamped channels, an event identical to the one
+  before it (all fields, timestamp included) is dropped. Such a repeat adds
+  no distance, time or speed sample, so no metric changes. Channels without
+  timestamps are left alone: two equal keystrokes are still two keystrokes.
+* a hard cap: a channel longer than its cap is resampled in time to at most
+  ``cap`` events (first event per equal-width time bucket), or truncated if
+  it has no timestamps.
+
+Before storage, cursor and touch paths are additionally simplified with
+Ramer-Douglas-Peucker. That only affects what is persisted; metrics are
+computed on the analysed stream.
+"""
+import numpy as np
+
+DEFAULT_CAP = 2_000
+DEFAULT_CAPS = {
+    'cursorData': 20_000,
+    'touchData': 20_000,
+    'scrollData': 5_000,
+    'keystrokeData': 5_000,
+}
+# Channels simplified with RDP before storage: key -> (x column, y column).
+PATHS = {'cursorData': ('x', 'y'), 'touchData': ('x', 'y')}
+
+
+def _repeats(channel):
+    """Mask of events identical to their predecessor."""
+    same = np.ones(len(channel) - 1, dtype=bool)
+    for column in channel.columns:
+        values = getattr(channel, column)
+        if not isinstance(values, np.ndarray):
+            values = np.asarray(values, dtype=object)
+        if values.dtype.kind == 'f':
+            same &= (values[1:] == values[:-1]) | (np.isnan(values[1:]) & np.isnan(values[:-1]))
+        else:
+            same &= values[1:] == values[:-1]
+    return np.concatenate(([False], same))
+
+
+def resample(t, cap):
+    """Indices of at most ``cap`` events: the first one in each of ``cap`` time buckets."""
+    span = int(t.max()) - int(t.min())
+    if span <= 0:
+        return np.arange(min(cap, t.size))
+    buckets = np.minimum((t - t.min()) * cap // span, cap - 1)
+    _, first = np.unique(buckets, return_index=True)
+    return np.sort(first)
+
+
+def rdp(x, y, epsilon):
+    """Indices kept by Ramer-Douglas-Peucker with tolerance ``epsilon``.
+
+    All open segments are processed together each round, so the Python loop
+    runs once per recursion level rather than once per segment.
+    """
+    n = x.size
+    if n < 3 or epsilon <= 0:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    starts = np.array([0])
+    ends = np.array([n - 1])
+    while starts.size:
+        inner = ends - starts - 1
+        starts, ends, inner = starts[inner > 0], ends[inner > 0], inner[inner > 0]
+        if not starts.size:
+            break
+        segment = np.repeat(np.arange(starts.size), inner)
+        offsets = np.cumsum(inner) - inner
+        points = starts[segment] + 1 + np.arange(segment.size) - offsets[segment]
+
+        x0, y0 = x[starts][segment], y[starts][segment]
+        dx, dy = x[ends][segment] - x0, y[ends][segment] - y0
+        length = np.hypot(dx, dy)
+        px, py = x[points] - x0, y[points] - y0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            distance = np.where(length > 0, np.abs(dx * py - dy * px) / length, np.hypot(px, py))
+
+        farthest = np.maximum.reduceat(distance, offsets)
+        split = farthest > epsilon
+        # First point in each segment that reaches the segment maximum.
+        at_max = np.flatnonzero(distance == farthest[segment])
+        _, first = np.unique(segment[at_max], return_index=True)
+        pivot = points[at_max[first]][split]
+        keep[pivot] = True
+        starts = np.concatenate((starts[split], pivot))
+        ends = np.concatenate((pivot, ends[split]))
+    return np.flatnonzero(keep)
+
+
+def reduce_for_analysis(frame, caps=None):
+    """Dedup and cap every channel of ``frame`` in place; returns per-channel stats."""
+    caps = {**DEFAULT_CAPS, **(caps or {})}
+    stats = {}
+    for attribute, channel in frame.channels().items():
+        received = len(channel)
+        if received < 2:
+            continue
+        index = np.flatnonzero(~_repeats(channel)) if 't' in channel.columns else np.arange(received)
+        cap = caps.get(channel.payload_key, DEFAULT_CAP)
+        if index.size > cap:
+            if 't' in channel.columns:
+                index = index[resample(channel.t[index], cap)]
+            else:
+                index = index[:cap]
+        if index.size < received:
+            setattr(frame, attribute, channel.take(index))
+            stats[channel.payload_key] = {'received': received, 'analysed': int(index.size)}
+    return stats
+
+
+def simplify_for_storage(frame, stats, epsilon):
+    """The payload to persist: ``frame``'s channels, with paths RDP-simplified."""
+    payload = dict(frame.payload)
+    for attribute, channel in frame.channels().items():
+        if channel.payload_key in PATHS and len(channel) > 2:
+            x_column, y_column = PATHS[channel.payload_key]
+            index = rdp(getattr(channel, x_column), getattr(channel, y_column), epsilon)
+            if index.size < len(channel):
+                entry = stats.setdefault(channel.payload_key, {'received': len(channel), 'analysed': len(channel)})
+                entry['stored'] = int(index.size)
+                channel = channel.take(index)
+        if channel.events is not frame.payload.get(channel.payload_key):
+            payload[channel.payload_key] = channel.events
+    for entry in stats.values():
+        entry.setdefault('stored', entry['analysed'])
+    return payload
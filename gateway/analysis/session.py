@@ -0,0 +1,181 @@
+"""Incremental behavior ingestion.
+
+A client can stream event deltas to ``POST /behavior/<session>/chunk`` while
+the user is on the page. Each chunk is decoded with ``BehaviorFrame`` and
+folded into the same per-channel accumulators /verify would run, so at submit
+time the session only has to be finalized instead of re-analysed.
+
+Each chunk is deduplicated and capped (``analysis.reduce``) before it is
+folded in, as a submitted payload is before analysis. The streamed events are
+kept too, so the finalized session can be stored like a submitted payload
+(``SummaryFrame.payload``), but never more than twice a channel's cap: past
+that the kept events are deduplicated and resampled back down to the cap,
+and once more when the session is finalized.
+
+Sessions live in process memory: deploy with sticky routing (or a single
+worker) if chunks and /verify may land on different workers. /verify falls
+back to analysing the submitted payload when it does not know the session.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from analysis.frame import CHANNELS, BehaviorFrame
+from analysis.reduce import DEFAULT_CAP, DEFAULT_CAPS, reduce_for_analysis
+from analysis.summaries import ACCUMULATORS
+
+_SCALARS = ('time_on_page', 'idle_time', 'zoom_level', 'browser_fingerprint',
+            'device_info', 'geo_location', 'device_orientation')
+_ATTRIBUTES = {key: attribute for attribute, key, _ in CHANNELS}
+
+
+def _compact(key, events, caps):
+    """``events`` of channel ``key`` deduplicated and resampled to at most its cap."""
+    frame = BehaviorFrame({key: events})
+    reduce_for_analysis(frame, caps)
+    return list(getattr(frame, _ATTRIBUTES[key]).events)
+
+
+class SummaryChannel:
+    """Stands in for a decoded ``Channel`` once only its summary is needed."""
+
+    def __init__(self, payload_key, count, summary):
+        self.payload_key = payload_key
+        self.count = count
+        self._summary = summary
+
+    def __len__(self):
+        return self.count
+
+    def derive(self, name, compute):
+        if name != 'summary' or self._summary is None:
+            raise LookupError(f"session aggregate for {self.payload_key!r} has no {name!r}")
+        return self._summary
+
+
+class SummaryFrame:
+    """Finalized session state with the attributes the verify pipeline reads."""
+
+    def __init__(self, channels, scalars, payload, reduction=None):
+        self.payload = payload
+        self.reduction = reduction or {}
+        self._channels = channels
+        for attribute, channel in channels.items():
+            setattr(self, attribute, channel)
+        for name, value in scalars.items():
+            setattr(self, name, value)
+
+    def channels(self):
+        return dict(self._channels)
+
+
+class SessionAggregate:
+    """Running per-channel state for one session."""
+
+    def __init__(self, caps=None):
+        self.caps = {**DEFAULT_CAPS, **(caps or {})}
+        self.received = {key: 0 for _, key, _ in CHANNELS}
+        self.counts = {attribute: 0 for attribute, _, _ in CHANNELS}
+        self.accumulators = {attribute: ACCUMULATORS[key]() for attribute, key, _ in CHANNELS if key in ACCUMULATORS}
+        self.scalars = dict.fromkeys(_SCALARS)
+        self.events = {key: [] for _, key, _ in CHANNELS}
+        self.fields = {}
+        self.chunks = 0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, payload):
+        frame = BehaviorFrame(payload)
+        reduction = reduce_for_analysis(frame, self.caps)
+        with self.lock:
+            for attribute, channel in frame.channels().items():
+                if not len(channel):
+                    continue
+                key = channel.payload_key
+                self.received[key] += reduction[key]['received'] if key in reduction else len(channel)
+                self.counts[attribute] += len(channel)
+                if attribute in self.accumulators:
+                    self.accumulators[attribute].update(channel)
+                kept = self.events[key]
+                kept.extend(channel.events)
+                if len(kept) > 2 * self.caps.get(key, DEFAULT_CAP):
+                    self.events[key] = _compact(key, kept, self.caps)
+            for name in _SCALARS:
+                value = getattr(frame, name)
+                if value is not None:
+                    self.scalars[name] = value
+            for key, value in payload.items():
+                if key not in self.events and value is not None:
+                    self.fields[key] = value
+            self.chunks += 1
+            self.updated_at = time.monotonic()
+        return self
+
+    def finalize(self):
+        """The session as a frame for /verify.
+
+        Its ``payload`` holds the streamed events kept for storage, and its
+        ``reduction`` the per-channel counts in ``payload_reduction`` form.
+        """
+        with self.lock:
+            stored, reduction = dict(self.fields), {}
+            for attribute, key, _ in CHANNELS:
+                kept = self.events[key]
+                if len(kept) > self.caps.get(key, DEFAULT_CAP):
+                    kept = self.events[key] = _compact(key, kept, self.caps)
+                if kept:
+                    stored[key] = kept
+                analysed = self.counts[attribute]
+                if self.received[key] > analysed or len(kept) < analysed:
+                    reduction[key] = {'received': self.received[key], 'analysed': analysed}
+                    if len(kept) < analysed:
+                        reduction[key]['stored'] = len(kept)
+            channels = {
+                attribute: SummaryChannel(
+                    key, self.counts[attribute],
+                    self.accumulators[attribute].result() if attribute in self.accumulators else None)
+                for attribute, key, _ in CHANNELS
+            }
+            return SummaryFrame(channels, dict(self.scalars), stored, reduction)
+
+
+class SessionStore:
+    """Bounded in-memory map of session id -> SessionAggregate.
+
+    Sessions idle for longer than ``ttl`` seconds are dropped, and the least
+    recently updated session is evicted once ``max_sessions`` is reached.
+    """
+
+    def __init__(self, max_sessions=10_000, ttl=1800, caps=None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.caps = caps
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _expire(self, now):
+        while self._sessions:
+            session_id, aggregate = next(iter(self._sessions.items()))
+            if now - aggregate.updated_at <= self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def get_or_create(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            aggregate = self._sessions.pop(session_id, None)
+            if aggregate is None or now - aggregate.updated_at > self.ttl:
+                aggregate = SessionAggregate(self.caps)
+            self._sessions[session_id] = aggregate
+            self._expire(now)
+            return aggregate
+
+    def pop(self, session_id):
+        with self._lock:
+            aggregate = self._sessions.pop(session_id, None)
+        if aggregate is None or time.monotonic() - aggregate.updated_at > self.ttl:
+            return None
+        return aggregate
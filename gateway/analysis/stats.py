@@ -0,0 +1,49 @@
+"""Mergeable running statistics."""
+import numpy as np
+
+
+class RunningStats:
+    """Count, mean, variance (Welford / Chan et al.) and extrema of a stream.
+
+    ``add`` takes a whole array at a time and folds its moments in with the
+    parallel-variance update, so per-chunk cost is a couple of array passes.
+    NaNs are ignored.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size:
+            mean = float(values.mean())
+            m2 = float(np.square(values - mean).sum())
+            self._combine(values.size, mean, m2, float(values.min()), float(values.max()))
+        return self
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other._m2, other.min, other.max)
+        return self
+
+    def _combine(self, count, mean, m2, minimum, maximum):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    @property
+    def variance(self):
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.variance))
@@ -0,0 +1,84 @@
+"""Per-channel summaries shared by the validity checks and feature extractors.
+
+Every summarised channel has an accumulator with ``update(channel)`` and
+``result()``. ``summary(channel)`` runs one over a decoded request; session
+ingestion (``analysis.session``) feeds the same accumulators chunk by chunk,
+so both paths produce identical summaries.
+"""
+from functools import partial
+
+import numpy as np
+
+from analysis.keyboard import KeystrokeAccumulator
+from analysis.stats import RunningStats
+from analysis.trajectory import TrajectoryAccumulator
+
+
+class ScrollAccumulator:
+    def __init__(self):
+        self.speed = RunningStats()
+        self.direction_changes = 0
+        self._last_direction = None
+
+    def update(self, scroll):
+        directions = np.asarray(scroll.direction, dtype=object)
+        if not directions.size:
+            return self
+        if self._last_direction is not None:
+            directions = np.concatenate(([self._last_direction], directions))
+        self._last_direction = directions[-1]
+        self.direction_changes += int(np.count_nonzero(directions[1:] != directions[:-1]))
+        self.speed.add(scroll.scroll_speed)
+        return self
+
+    def result(self):
+        return {'average_speed': self.speed.mean, 'direction_changes': self.direction_changes}
+
+
+class CountAccumulator:
+    """Number of events whose ``column`` equals ``value``."""
+
+    def __init__(self, column, value):
+        self.column = column
+        self.value = value
+        self.count = 0
+
+    def update(self, channel):
+        self.count += int(np.count_nonzero(np.asarray(getattr(channel, self.column), dtype=object) == self.value))
+        return self
+
+    def result(self):
+        return {'count': self.count}
+
+
+class SumAccumulator:
+    """Sum of a numeric ``column``, ignoring missing values."""
+
+    def __init__(self, column):
+        self.column = column
+        self.total = 0.0
+
+    def update(self, channel):
+        self.total += float(np.nansum(getattr(channel, self.column)))
+        return self
+
+    def result(self):
+        return {'total': self.total}
+
+
+# Channel payload key -> accumulator factory.
+ACCUMULATORS = {
+    'cursorData': TrajectoryAccumulator,
+    'keystrokeData': KeystrokeAccumulator,
+    'scrollData': ScrollAccumulator,
+    'windowFocusData': partial(CountAccumulator, 'focused', False),
+    'pageVisibility': partial(CountAccumulator, 'visible', False),
+    'copyPasteData': partial(CountAccumulator, 'action', 'paste'),
+    'formInteraction': partial(SumAccumulator, 'time_spent'),
+    'hoverData': partial(SumAccumulator, 'duration'),
+}
+
+
+def summary(channel):
+    """The accumulator result for a channel, computed once per request."""
+    return channel.derive('summary', lambda c: ACCUMULATORS[c.payload_key]().update(c).result())
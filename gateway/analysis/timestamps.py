@@ -0,0 +1,123 @@
+"""Batch decoding of behavior-channel timestamps.
+
+Every timestamped channel the client sends is produced by
+``new Date().toISOString()``, i.e. the fixed 24 byte layout
+``YYYY-MM-DDTHH:MM:SS.sssZ``. Those rows are decoded together from one byte
+buffer; anything else goes through ``datetime.fromisoformat`` one at a time.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+ISO_LENGTH = 24
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MS = timedelta(milliseconds=1)
+
+_TEMPLATE = np.frombuffer(b'0000-00-00T00:00:00.000Z', dtype=np.uint8)
+# Largest byte offset from the template allowed per column: 9 for digits, 0 for separators.
+_LIMITS = np.where(_TEMPLATE == ord('0'), 9, 0).astype(np.uint8)
+_DAYS_IN_MONTH = np.array([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+
+
+def _place_values():
+    # Maps the 24 byte columns onto year, month, day, hour, minute, second, ms.
+    fields = [(0, 4), (5, 7), (8, 10), (11, 13), (14, 16), (17, 19), (20, 23)]
+    weights = np.zeros((len(fields), ISO_LENGTH), dtype=np.float32)
+    for field, (start, stop) in enumerate(fields):
+        for column in range(start, stop):
+            weights[field, column] = 10 ** (stop - 1 - column)
+    return weights
+
+
+_PLACE_VALUES = _place_values()
+
+
+def _days_from_civil(year, month, day):
+    # Howard Hinnant's days_from_civil, valid for the proleptic Gregorian calendar.
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * np.where(month > 2, month - 3, month + 9) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _decode_fixed(buffer, count):
+    """Decode ``count`` concatenated 24 byte timestamps; returns (ms, valid mask)."""
+    raw = np.frombuffer(buffer, dtype=np.uint8).reshape(count, ISO_LENGTH)
+    # uint8 wraps below '0', so every non-digit byte ends up > 9.
+    digits = raw - _TEMPLATE
+    bad = (digits > _LIMITS).view(np.uint64)
+    valid = (bad[:, 0] | bad[:, 1] | bad[:, 2]) == 0
+
+    # Separator columns carry zero weight and every field is an integer far
+    # below 2**24, so float32 sums are exact.
+    fields = (_PLACE_VALUES @ digits.T.astype(np.float32)).astype(np.int64)
+    year, month, day, hour, minute, second, millisecond = fields
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_length = _DAYS_IN_MONTH[np.clip(month, 0, 12)] - ((month == 2) & ~leap)
+    valid &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_length)
+    valid &= (hour < 24) & (minute < 60) & (second < 60)
+
+    days = _days_from_civil(year, month, day)
+    ms = (((days * 24 + hour) * 60 + minute) * 60 + second) * 1000 + millisecond
+    return ms, valid
+
+
+def parse_timestamp(value):
+    """Epoch milliseconds for one ISO-8601 string; naive values are taken as UTC."""
+    if not isinstance(value, str):
+        raise TypeError(f"timestamp must be a string, not {type(value).__name__}")
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return (parsed - _EPOCH) // _MS
+
+
+def decode_timestamps(values):
+    """Decode a sequence of ISO-8601 strings to an int64 array of epoch milliseconds.
+
+    Raises ``ValueError``/``TypeError`` like ``datetime.fromisoformat`` for
+    values that are not timestamps at all.
+    """
+    values = values if isinstance(values, list) else list(values)
+    count = len(values)
+    result = np.empty(count, dtype=np.int64)
+    if count == 0:
+        return result
+
+    try:
+        buffer = ''.join(values).encode('ascii') if set(map(len, values)) == {ISO_LENGTH} else None
+    except (TypeError, UnicodeEncodeError):
+        buffer = None
+    if buffer is not None:
+        ms, valid = _decode_fixed(buffer, count)
+        if valid.all():
+            return ms
+        result[valid] = ms[valid]
+        fallback = ~valid
+    else:
+        fallback = np.ones(count, dtype=bool)
+        rows = [i for i, value in enumerate(values) if isinstance(value, str) and len(value) == ISO_LENGTH]
+        try:
+            buffer = ''.join([values[i] for i in rows]).encode('ascii')
+        except UnicodeEncodeError:
+            rows = []
+        if rows:
+            rows = np.array(rows, dtype=np.intp)
+            ms, valid = _decode_fixed(buffer, rows.size)
+            result[rows[valid]] = ms[valid]
+            fallback[rows[valid]] = False
+
+    for i in np.flatnonzero(fallback):
+        result[i] = parse_timestamp(values[i])
+    return result
+
+
+def channel_timestamps(events, key='timestamp'):
+    """Decode the ``key`` field of every event in a behavior channel."""
+    return decode_timestamps([event[key] for event in events])
@@ -0,0 +1,76 @@
+"""Vectorized cursor trajectory metrics.
+
+The /verify handler used to walk cursorData pair by pair; everything here
+works on whole arrays instead so the cost per point is a few array ops.
+"""
+import numpy as np
+
+from analysis.entropy import ANGLE_EDGES, SPEED_EDGES, Histogram
+from analysis.stats import RunningStats
+
+
+class TrajectoryAccumulator:
+    """MouseMetrics for a cursor trajectory fed in one or more chunks.
+
+    Mirrors the original per-pair loop: pairs with a non-positive time delta
+    count towards the totals but produce no speed sample, and acceleration is
+    the change between consecutive speed samples over the later pair's delta.
+    The last point and speed of each chunk are carried over, so feeding a
+    trajectory in pieces gives the same result as feeding it whole.
+    """
+
+    def __init__(self, speed_edges=SPEED_EDGES, angle_edges=ANGLE_EDGES):
+        self.total_distance = 0.0
+        self.total_time = 0.0
+        self.speeds = RunningStats()
+        self.accelerations = RunningStats()
+        self.speed_histogram = Histogram(speed_edges)
+        self.angle_histogram = Histogram(angle_edges)
+        self._last_point = None
+        self._last_speed = None
+
+    def update(self, cursor):
+        x, y, t = cursor.x, cursor.y, cursor.t
+        if not len(x):
+            return self
+        if self._last_point is not None:
+            last_x, last_y, last_t = self._last_point
+            x = np.concatenate(([last_x], x))
+            y = np.concatenate(([last_y], y))
+            t = np.concatenate(([last_t], t))
+        self._last_point = (x[-1], y[-1], t[-1])
+
+        dx = np.diff(x)
+        dy = np.diff(y)
+        distances = np.sqrt(np.square(dx) + np.square(dy))
+        time_diffs = np.diff(t) / 1000.0
+
+        moving = time_diffs > 0
+        moving_diffs = time_diffs[moving]
+        speeds = distances[moving] / moving_diffs
+        if self._last_speed is not None:
+            accelerations = np.diff(np.concatenate(([self._last_speed], speeds))) / moving_diffs
+        else:
+            accelerations = np.diff(speeds) / moving_diffs[1:]
+        if speeds.size:
+            self._last_speed = speeds[-1]
+
+        moved = (dx != 0) | (dy != 0)
+        self.total_distance += float(distances.sum())
+        self.total_time += float(time_diffs.sum())
+        self.speeds.add(speeds)
+        self.accelerations.add(accelerations)
+        self.speed_histogram.add(speeds)
+        self.angle_histogram.add(np.arctan2(dy[moved], dx[moved]))
+        return self
+
+    def result(self):
+        return {
+            'total_distance': self.total_distance,
+            'total_time': self.total_time,
+            'average_speed': self.total_distance / self.total_time if self.total_time > 0 else 0,
+            'max_speed': self.speeds.max if self.speeds.count else 0,
+            'acceleration': self.accelerations.mean if self.accelerations.count else 0,
+            'entropy': self.speed_histogram.entropy(),
+            'angle_entropy': self.angle_histogram.entropy(),
+        }
@@ -0,0 +1,125 @@
+"""Compact binary encoding of behavior payloads.
+
+A request sent as ``Content-Type: application/msgpack`` has the same shape as
+the JSON body, but any list-valued channel inside ``userBehaviorData`` may be
+packed column-wise instead of as a list of event objects::
+
+    "cursorData": {
+        "n": 1532,                  # number of events
+        "t0": 1725192000000,        # base epoch ms
+        "x": <bin>, "y": <bin>,     # int32 LE deltas, first one from 0
+        "timestamp": <bin>,         # int32 LE ms deltas, first one from t0
+    }
+
+Other numeric fields are float32 LE, boolean fields uint8, text fields a
+msgpack array of strings. Omitted fields decode as missing values. Binary
+columns are wrapped with ``np.frombuffer`` without copying; only the delta
+columns allocate, for their running sum.
+"""
+import numpy as np
+
+from analysis.frame import CHANNEL_COLUMNS, TEXT, TIME, Channel, ColumnarEvents
+
+try:
+    import msgpack
+except ImportError:  # optional: JSON keeps working without it
+    msgpack = None
+
+CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Position-like fields, sent as integer deltas (whole CSS pixels).
+DELTA_FIELDS = {'x', 'y', 'scrollTop', 'width', 'height', 'startX', 'startY', 'endX', 'endY'}
+
+
+class WireFormatError(ValueError):
+    pass
+
+
+def is_binary(content_type):
+    return (content_type or '').split(';')[0].strip().lower() in CONTENT_TYPES
+
+
+def _column(packed, field, count, dtype):
+    raw = packed[field]
+    if not isinstance(raw, (bytes, bytearray, memoryview)):
+        raise WireFormatError(f"field {field!r} must be binary")
+    if len(raw) != count * np.dtype(dtype).itemsize:
+        raise WireFormatError(f"field {field!r} has {len(raw)} bytes for {count} events")
+    return np.frombuffer(raw, dtype=dtype)
+
+
+def _integer(packed, field, default=None, minimum=None):
+    value = packed.get(field, default)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise WireFormatError(f"field {field!r} must be an integer")
+    if minimum is not None and value < minimum:
+        raise WireFormatError(f"field {field!r} must be at least {minimum}")
+    return value
+
+
+def unpack_channel(key, packed):
+    if not isinstance(packed, dict) or 'n' not in packed:
+        raise WireFormatError(f"{key} must be a list of events or a packed channel")
+    count = _integer(packed, 'n', minimum=0)
+    arrays = {}
+    for column, field, dtype in CHANNEL_COLUMNS[key]:
+        if field not in packed:
+            continue
+        if dtype is TIME:
+            deltas = _column(packed, field, count, '<i4')
+            arrays[column] = _integer(packed, 't0', 0) + np.cumsum(deltas, dtype=np.int64)
+        elif dtype is TEXT:
+            values = packed[field]
+            if not isinstance(values, list) or len(values) != count:
+                raise WireFormatError(f"field {field!r} must be a list of {count} strings")
+            arrays[column] = values
+        elif dtype is np.bool_:
+            arrays[column] = _column(packed, field, count, np.uint8).view(np.bool_)
+        elif field in DELTA_FIELDS:
+            arrays[column] = np.cumsum(_column(packed, field, count, '<i4'), dtype=np.int64).astype(np.float64)
+        else:
+            arrays[column] = _column(packed, field, count, '<f4')
+    return ColumnarEvents(key, count, arrays)
+
+
+def decode(body, behavior_key='userBehaviorData'):
+    """Decode a msgpack request body into the JSON-shaped request dict.
+
+    Packed channels are looked for under ``behavior_key``, or at the top
+    level when it is None (session chunks).
+    """
+    if msgpack is None:
+        raise WireFormatError("msgpack is not installed on this server")
+    try:
+        data = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise WireFormatError(f"invalid msgpack body: {e}") from e
+    if not isinstance(data, dict):
+        raise WireFormatError("body must be a map")
+    behavior = data if behavior_key is None else data.get(behavior_key)
+    if isinstance(behavior, dict):
+        for key, value in behavior.items():
+            if key in CHANNEL_COLUMNS and isinstance(value, dict):
+                behavior[key] = unpack_channel(key, value)
+    return data
+
+
+def pack_channel(key, events):
+    """Reference encoder for one channel (what a client sends)."""
+    channel = Channel(key, events, CHANNEL_COLUMNS[key])
+    packed = {'n': len(events)}
+    for column, field, dtype in CHANNEL_COLUMNS[key]:
+        values = getattr(channel, column)
+        if dtype is TIME:
+            base = int(values[0]) if len(values) else 0
+            packed['t0'] = base
+            packed[field] = np.diff(values, prepend=base).astype('<i4').tobytes()
+        elif dtype is TEXT:
+            packed[field] = values
+        elif dtype is np.bool_:
+            packed[field] = values.astype(np.uint8).tobytes()
+        elif field in DELTA_FIELDS:
+            packed[field] = np.diff(np.rint(values).astype(np.int64), prepend=0).astype('<i4').tobytes()
+        else:
+            packed[field] = values.astype('<f4').tobytes()
+    return packed
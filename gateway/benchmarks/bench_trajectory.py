@@ -0,0 +1,89 @@
+"""Compare the legacy per-pair cursor loop with the vectorized trajectory engine.
+
+Run from the gateway directory:
+
+    python -m benchmarks.bench_trajectory
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from analysis.frame import BehaviorFrame
+from analysis.summaries import summary
+
+SIZES = (1_000, 10_000, 100_000)
+FIELDS = ('total_distance', 'total_time', 'average_speed', 'max_speed', 'acceleration')
+
+
+def make_cursor_data(n, seed=0):
+    rng = np.random.default_rng(seed)
+    xs = np.cumsum(rng.normal(0, 4, n)) + 500
+    ys = np.cumsum(rng.normal(0, 4, n)) + 400
+    # Browsers coalesce mousemove events, so a few deltas are 0 ms.
+    steps = rng.integers(0, 20, n)
+    start = datetime(2024, 9, 1, 12, 0, tzinfo=timezone.utc)
+    stamps = start + np.cumsum(steps) * timedelta(milliseconds=1)
+    return [
+        {'x': float(x), 'y': float(y), 'timestamp': stamp.isoformat(timespec='milliseconds').replace('+00:00', 'Z')}
+        for x, y, stamp in zip(xs, ys, stamps)
+    ]
+
+
+def legacy_metrics(cursor_data):
+    # The loop analyze_mouse_movement ran before the trajectory engine.
+    from scipy.spatial.distance import euclidean
+
+    total_distance = 0
+    total_time = 0
+    speeds = []
+    accelerations = []
+    for i in range(1, len(cursor_data)):
+        start = cursor_data[i-1]
+        end = cursor_data[i]
+        distance = euclidean((start['x'], start['y']), (end['x'], end['y']))
+        time_diff = (datetime.fromisoformat(end['timestamp']) - datetime.fromisoformat(start['timestamp'])).total_seconds()
+        if time_diff > 0:
+            speed = distance / time_diff
+            speeds.append(speed)
+            if len(speeds) > 1:
+                accelerations.append((speed - speeds[-2]) / time_diff)
+        total_distance += distance
+        total_time += time_diff
+    return {
+        'total_distance': total_distance,
+        'total_time': total_time,
+        'average_speed': total_distance / total_time if total_time > 0 else 0,
+        'max_speed': max(speeds) if speeds else 0,
+        'acceleration': np.mean(accelerations) if accelerations else 0,
+    }
+
+
+def vectorized_metrics(cursor_data):
+    return summary(BehaviorFrame({'cursorData': cursor_data}).cursor)
+
+
+def best_of(fn, arg, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    print(f"{'points':>8} {'legacy ms':>10} {'vector ms':>10} {'speedup':>8}")
+    for n in SIZES:
+        cursor_data = make_cursor_data(n)
+        repeats = 3 if n >= 100_000 else 5
+        legacy_time, expected = best_of(legacy_metrics, cursor_data, repeats)
+        vector_time, actual = best_of(vectorized_metrics, cursor_data, repeats)
+        for field in FIELDS:
+            if not np.isclose(expected[field], actual[field], rtol=1e-9, atol=1e-9):
+                raise AssertionError(f"{field} mismatch at n={n}: {expected[field]} != {actual[field]}")
+        print(f"{n:>8} {legacy_time * 1e3:>10.2f} {vector_time * 1e3:>10.2f} {legacy_time / vector_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
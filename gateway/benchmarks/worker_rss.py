@@ -0,0 +1,92 @@
+"""Per-worker memory of the gunicorn deployment, with and without preload.
+
+Starts ``gunicorn app:app`` (with gunicorn.conf.py) once per mode, waits for
+every worker to answer /ready and serve a few requests, then reads each
+worker's /proc/<pid>/smaps_rollup:
+
+* RSS: resident pages, shared ones counted in full
+* PSS: shared pages split between the processes sharing them
+* USS: pages private to the worker (what it really costs)
+
+Linux only. Run from gateway/:
+
+    python -m benchmarks.worker_rss --workers 4 [--model path/to/model]
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def _memory(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                values[name] = int(rest.split()[0]) / 1024
+    return {'rss': values['Rss'], 'pss': values['Pss'], 'uss': values['Private_Clean'] + values['Private_Dirty']}
+
+
+def measure(preload, workers, model=None, requests=50, timeout=60):
+    port = _free_port()
+    env = dict(os.environ, GUNICORN_PRELOAD='1' if preload else '0')
+    if model:
+        env['MODEL_PATH'] = model
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '--config', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--workers', str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/ready', timeout=1) as response:
+                    if response.status == 200 and len(_children(server.pid)) == workers:
+                        break
+            except OSError:
+                pass
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError("gunicorn did not become ready")
+            time.sleep(0.2)
+        for _ in range(requests):
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/ready', timeout=5).read()
+        return [_memory(pid) for pid in _children(server.pid)]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker RSS/PSS/USS with and without preload")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--model', help="MODEL_PATH to serve while measuring")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'worker':>6} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8}")
+    for preload in (False, True):
+        mode = 'preload' if preload else 'per-worker'
+        rows = measure(preload, args.workers, args.model)
+        for i, row in enumerate(rows):
+            print(f"{mode:<10} {i:>6} {row['rss']:>8.1f} {row['pss']:>8.1f} {row['uss']:>8.1f}")
+        mean = {key: sum(row[key] for row in rows) / len(rows) for key in ('rss', 'pss', 'uss')}
+        print(f"{mode:<10} {'mean':>6} {mean['rss']:>8.1f} {mean['pss']:>8.1f} {mean['uss']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,75 @@
 import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def _list(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
 
 class Config:
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'csv'}
 
+    # Comma separated feature extractor names; unset means all registered extractors.
+    FEATURE_EXTRACTORS = _list(os.getenv('FEATURE_EXTRACTORS'))
+
+    # In-memory state for POST /behavior/<session>/chunk.
+    SESSION_MAX = int(os.getenv('SESSION_MAX', 10000))
+    SESSION_TTL = int(os.getenv('SESSION_TTL', 1800))
+
+    # Per-channel event caps before analysis, e.g. "cursorData=20000,keystrokeData=5000".
+    CHANNEL_CAPS = {key: int(cap) for key, _, cap in (item.partition('=') for item in _list(os.getenv('CHANNEL_CAPS')) or [])}
+    # RDP tolerance in px for stored cursor/touch paths; 0 stores them unsimplified.
+    STORAGE_SIMPLIFY_EPSILON = float(os.getenv('STORAGE_SIMPLIFY_EPSILON', 1.0))
+
+    # Limits for gzip/deflate/zstd request bodies: decoded bytes, and decoded/encoded size.
+    MAX_DECOMPRESSED_BYTES = int(os.getenv('MAX_DECOMPRESSED_BYTES', 16 * 1024 * 1024))
+    MAX_COMPRESSION_RATIO = int(os.getenv('MAX_COMPRESSION_RATIO', 100))
+
+    # IsolationForest exported with inference.forest (or a joblib pickle); unset disables scoring. Checked for changes every MODEL_POLL_INTERVAL s.
+    MODEL_PATH = os.getenv('MODEL_PATH')
+    MODEL_POLL_INTERVAL = float(os.getenv('MODEL_POLL_INTERVAL', 5))
+    # Concurrent /verify requests are scored together: up to MODEL_BATCH_SIZE rows, waiting at most
+    # MODEL_BATCH_WAIT_MS for the batch to fill. A size of 1 scores every request on its own; only raise it
+    # when workers serve requests concurrently (gunicorn threads), or every prediction just waits.
+    MODEL_BATCH_SIZE = int(os.getenv('MODEL_BATCH_SIZE', 1))
+    MODEL_BATCH_WAIT_MS = float(os.getenv('MODEL_BATCH_WAIT_MS', 2))
+
+    # Repeated submissions (same fingerprint, same features to within VERDICT_CACHE_QUANTUM) reuse the
+    # verdict for VERDICT_CACHE_TTL s, until their attempt count doubles. A size of 0 disables the cache.
+    VERDICT_CACHE_SIZE = int(os.getenv('VERDICT_CACHE_SIZE', 10000))
+    VERDICT_CACHE_TTL = float(os.getenv('VERDICT_CACHE_TTL', 60))
+    VERDICT_CACHE_QUANTUM = float(os.getenv('VERDICT_CACHE_QUANTUM', 0.01))
+
+    # Per-IP / per-fingerprint history: keys kept in memory, and seconds between Mongo flushes.
+    HISTORY_MAX_KEYS = int(os.getenv('HISTORY_MAX_KEYS', 100000))
+    HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', 5))
+
+    # Seconds between refreshes of the cached VerificationLog totals shown by the admin listing.
+    ADMIN_TOTALS_REFRESH = float(os.getenv('ADMIN_TOTALS_REFRESH', 10))
+    # The first exact count covers logs older than this many seconds, long enough for queued writes to land.
+    ADMIN_TOTALS_LAG = float(os.getenv('ADMIN_TOTALS_LAG', 60))
+
+    # Persistence of VerificationLog/UserBehavior: sync, acknowledged (batched, waits for the ack) or
+    # fire_and_forget. Queued writes are batched per collection; a full queue falls back to a direct insert.
+    # A batch is written as soon as the queue is empty, or after WRITE_FLUSH_INTERVAL_MS if that is set.
+    WRITE_MODE = os.getenv('WRITE_MODE', 'acknowledged')
+    WRITE_QUEUE_MAX = int(os.getenv('WRITE_QUEUE_MAX', 10000))
+    WRITE_BATCH_SIZE = int(os.getenv('WRITE_BATCH_SIZE', 500))
+    WRITE_FLUSH_INTERVAL_MS = float(os.getenv('WRITE_FLUSH_INTERVAL_MS', 0))
+    WRITE_WORKERS = int(os.getenv('WRITE_WORKERS', 1))
+    # Stored behavior layout: 'document' (one UserBehavior per verification), 'packed' (one UserBehavior with
+    # binary-packed channels) or 'chunked' (a BehaviorSession header plus per-channel BehaviorChunk documents
+    # of at most BEHAVIOR_CHUNK_EVENTS events). Packed channels are zstd-compressed at BEHAVIOR_ZSTD_LEVEL (0: off).
+    BEHAVIOR_STORAGE = os.getenv('BEHAVIOR_STORAGE', 'document')
+    BEHAVIOR_CHUNK_EVENTS = int(os.getenv('BEHAVIOR_CHUNK_EVENTS', 1000))
+    BEHAVIOR_ZSTD_LEVEL = int(os.getenv('BEHAVIOR_ZSTD_LEVEL', 3))
+
+    # Candidate models scored in the background on a SHADOW_SAMPLE_RATE share of /verify traffic.
+    SHADOW_MODEL_PATHS = _list(os.getenv('SHADOW_MODEL_PATHS'))
+    SHADOW_SAMPLE_RATE = float(os.getenv('SHADOW_SAMPLE_RATE', 1.0))
+    SHADOW_WORKERS = int(os.getenv('SHADOW_WORKERS', 1))
+    SHADOW_MAX_PENDING = int(os.getenv('SHADOW_MAX_PENDING', 1000))
+
 if not os.path.exists(Config.UPLOAD_FOLDER):
     os.makedirs(Config.UPLOAD_FOLDER)
@@ -1,23 +1,92 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_cors import CORS
-from mongoengine import connect
+from mongoengine import connect, disconnect_all
 from dotenv import load_dotenv
 import os
 import sys
 from routes import verify
+from config import Config
+from analysis.features import FeaturePipeline
+from analysis.session import SessionStore
+from analysis.history import HistoryStore
+from models.BehaviorHistory import BehaviorHistory
+from models.LogCounter import LogCounter
+from models.VerificationLog import VerificationLog
+from storage.writebehind import WriteBehind, flush_on_sigterm
+from storage.totals import LogTotals
+import atexit
+from inference.holder import ModelHolder
+from inference.shadow import ShadowScorer
+from inference.verdicts import VerdictCache
+from metrics import metrics
+from user_agents import parse
+
+def connect_db():
+    # pymongo clients are not fork-safe: a forked worker drops the inherited one and opens its own.
+    disconnect_all()
+    connect(host=os.getenv('MONGO_URI'))
+
+def load_shared_tables(app):
+    """Read-only tables every request uses, loaded up front so a preloading master shares them."""
+    parse('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+
+def stop_background(app):
+    """Stop this process's background threads, e.g. in a master about to fork workers."""
+    app.extensions['model'].stop()
+    app.extensions['shadow'].stop()
+
+def init_worker(app):
+    """Per-process setup for a worker forked from a preloaded app (see gunicorn.conf.py)."""
+    connect_db()
+    app.extensions['model'].watch()
+    app.extensions['shadow'].after_fork()
 
 def create_app():
     load_dotenv()
     app = Flask(__name__)
+    app.config.from_object(Config)
     sys.stdout.flush()
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
     CORS(app)
-    connect(host=os.getenv('MONGO_URI'))
+    connect_db()
+    load_shared_tables(app)
+    app.extensions['features'] = FeaturePipeline(app.config['FEATURE_EXTRACTORS'])
+    app.extensions['sessions'] = SessionStore(app.config['SESSION_MAX'], app.config['SESSION_TTL'],
+                                              app.config['CHANNEL_CAPS'])
+    app.extensions['writer'] = WriteBehind(app.config['WRITE_MODE'], app.config['WRITE_QUEUE_MAX'],
+                                           app.config['WRITE_BATCH_SIZE'], app.config['WRITE_FLUSH_INTERVAL_MS'],
+                                           app.config['WRITE_WORKERS'])
+    atexit.register(app.extensions['writer'].close)
+    flush_on_sigterm(app.extensions['writer'])
+    app.extensions['history'] = HistoryStore(BehaviorHistory._get_collection, app.config['HISTORY_MAX_KEYS'],
+                                             app.config['HISTORY_FLUSH_INTERVAL'])
+    app.extensions['totals'] = LogTotals(VerificationLog._get_collection, LogCounter._get_collection,
+                                         VerificationLog._get_collection_name(), app.config['ADMIN_TOTALS_REFRESH'],
+                                         app.config['ADMIN_TOTALS_LAG'])
+    features = app.extensions['features']
+    app.extensions['model'] = ModelHolder(app.config['MODEL_PATH'], features.width, features.schema_id,
+                                          app.config['MODEL_POLL_INTERVAL'], app.config['MODEL_BATCH_SIZE'],
+                                          app.config['MODEL_BATCH_WAIT_MS']).start()
+    app.extensions['shadow'] = ShadowScorer(app.config['SHADOW_MODEL_PATHS'], features.width, features.schema_id,
+                                            app.config['SHADOW_SAMPLE_RATE'], app.config['SHADOW_WORKERS'],
+                                            app.config['SHADOW_MAX_PENDING'], app.config['MODEL_POLL_INTERVAL']).start()
+    app.extensions['verdicts'] = VerdictCache(app.config['VERDICT_CACHE_SIZE'], app.config['VERDICT_CACHE_TTL'],
+                                              app.config['VERDICT_CACHE_QUANTUM'])
     app.register_blueprint(verify.bp)
 
     @app.route('/')
     def home():
         return 'Flask running at 5000'
+
+    @app.route('/ready')
+    def ready():
+        if not app.extensions['model'].ready:
+            return jsonify({"ready": False}), 503
+        return jsonify({"ready": True})
+
+    @app.route('/metrics')
+    def process_metrics():
+        return jsonify(metrics.snapshot())
     
     return app
 
@@ -0,0 +1,44 @@
+"""gunicorn settings, read from the working directory.
+
+By default the app is preloaded: the master imports every module and builds
+the app once, model and UA tables included, then forks the workers.
+Just before each fork ``gc.freeze()`` moves everything allocated so far into
+a generation the collector never visits, so workers do not write to (and so
+copy) those shared pages. The master stops its own model watchers before
+forking; each worker reconnects to Mongo and starts its own.
+
+Set GUNICORN_PRELOAD=0 to build the app in every worker instead.
+
+``python -m benchmarks.worker_rss`` compares per-worker memory both ways.
+"""
+import gc
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+
+
+def when_ready(server):
+    # The master only forks from here on; workers run their own watcher threads.
+    if preload_app:
+        from configApp import stop_background
+
+        stop_background(server.app.wsgi())
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from configApp import init_worker
+
+        init_worker(server.app.wsgi())
+
+
+def worker_exit(server, worker):
+    # Queued VerificationLog/UserBehavior writes must land before the worker goes away.
+    app = getattr(worker, 'wsgi', None)
+    if app is not None:
+        app.extensions['writer'].close()
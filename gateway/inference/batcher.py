@@ -0,0 +1,98 @@
+"""Micro-batching for model scoring under a threaded worker.
+
+Concurrent requests each submit one feature vector and block. A scheduler
+thread takes the first waiting vector, keeps collecting until ``max_batch``
+vectors are queued or ``max_wait_ms`` has passed since that first one
+arrived, scores the stacked matrix with one vectorized call and hands every
+request its own row of the result.
+
+A request waits at most ``timeout`` seconds for its batch. If the scheduler
+has stalled or died by then, the request scores its own vector inline
+(counted in ``model.batch.timeouts``), and the next submit restarts a dead
+scheduler.
+"""
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from metrics import metrics
+
+
+class _Pending:
+    __slots__ = ('features', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, features):
+        self.features = features
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Runs ``score_batch(matrix) -> sequence of per-row results`` on batched submissions."""
+
+    def __init__(self, score_batch, max_batch=32, max_wait_ms=2.0, timeout=1.0):
+        self.score_batch = score_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_running(self):
+        # Threads do not survive fork: a preloaded app starts its scheduler in each worker.
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(target=self._run, name='model-batcher', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, features):
+        """Score one vector; blocks until its batch has been scored, or scores it inline after ``timeout``."""
+        self._ensure_running()
+        pending = _Pending(features)
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            metrics.incr('model.batch.timeouts')
+            return self.score_batch(np.stack([features]))[0]
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            flushed = time.perf_counter()
+            for pending in batch:
+                metrics.observe('model.batch.queue_ms', (flushed - pending.enqueued) * 1000)
+            metrics.observe('model.batch.size', len(batch))
+            metrics.observe('model.batch.fill', len(batch) / self.max_batch)
+            try:
+                results = self.score_batch(np.stack([pending.features for pending in batch]))
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            for pending in batch:
+                pending.done.set()
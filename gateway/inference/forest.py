@@ -0,0 +1,174 @@
+"""IsolationForest flattened into node arrays, scored with NumPy alone.
+
+``export_forest`` writes a fitted sklearn ``IsolationForest`` as one file:
+
+    b'GFFOREST' | uint32 LE header length | JSON header | arrays
+
+Every tree's nodes are concatenated into the arrays ``feature`` (int32,
+already mapped to the full feature vector through the tree's feature
+subset), ``threshold`` (float64), ``left`` / ``right`` (int32, global node
+ids) and ``path_length`` (float64: for a leaf, its depth plus the average
+path length of the training samples that ended there). ``roots`` holds
+each tree's first node. Leaves point to themselves, so walking every tree
+``max_depth`` steps lands each sample on its leaf without branching.
+
+Arrays start on 64-byte boundaries (header offsets count from the first
+one after the header). ``load_forest`` maps the file read-only, so workers
+share its pages instead of unpickling a copy each, and serving it needs
+neither sklearn nor scipy.
+
+    python -m inference.forest model.joblib model.forest
+"""
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b'GFFOREST'
+_ALIGN = 64
+_ARRAYS = (('feature', np.int32), ('threshold', np.float64), ('left', np.int32),
+           ('right', np.int32), ('path_length', np.float64), ('roots', np.int32))
+
+
+def _aligned(position):
+    return -(-position // _ALIGN) * _ALIGN
+
+
+def average_path_length(n):
+    """Average path length of an unsuccessful BST search among ``n`` points (c(n) in the paper)."""
+    n = np.asarray(n, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+def _flatten(model):
+    parts = {name: [] for name, _ in _ARRAYS}
+    base = 0
+    max_depth = 0
+    for estimator, features in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        count = tree.node_count
+        leaf = tree.children_left == -1
+        ids = np.arange(count)
+
+        depth = np.zeros(count, dtype=np.int64)
+        for node in range(count):  # children always come after their parent
+            if not leaf[node]:
+                depth[tree.children_left[node]] = depth[tree.children_right[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+        parts['feature'].append(np.where(leaf, 0, np.asarray(features)[np.maximum(tree.feature, 0)]))
+        parts['threshold'].append(np.where(leaf, np.inf, tree.threshold))
+        parts['left'].append(base + np.where(leaf, ids, tree.children_left))
+        parts['right'].append(base + np.where(leaf, ids, tree.children_right))
+        parts['path_length'].append(np.where(leaf, depth + average_path_length(tree.n_node_samples), 0.0))
+        parts['roots'].append([base])
+        base += count
+    arrays = {name: np.ascontiguousarray(np.concatenate(parts[name]), dtype=dtype) for name, dtype in _ARRAYS}
+    return arrays, max_depth
+
+
+def export_forest(model, path, version=None, feature_schema=None):
+    """Write a fitted IsolationForest to ``path`` (atomically, so a watcher never sees half a file)."""
+    arrays, max_depth = _flatten(model)
+    header = {
+        'version': version,
+        'feature_schema': feature_schema,
+        'n_features': int(model.n_features_in_),
+        'max_depth': max_depth,
+        'denominator': float(len(model.estimators_) * average_path_length([model._max_samples])[0]),
+        'offset': float(model.offset_),
+        'arrays': {},
+    }
+    position = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = [array.dtype.str, list(array.shape), position]
+        position = _aligned(position + array.nbytes)
+    encoded = json.dumps(header).encode()
+    data_start = _aligned(len(MAGIC) + 4 + len(encoded))
+
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(encoded)) + encoded)
+        for name, array in arrays.items():
+            f.write(b'\0' * (data_start + header['arrays'][name][2] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+def is_flat_forest(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class FlatForest:
+    """Scores like ``IsolationForest``: ``score_samples``, ``decision_function``, ``predict``."""
+
+    def __init__(self, header, arrays):
+        self.version = header.get('version')
+        self.feature_schema = header.get('feature_schema')
+        self.n_features_in_ = header['n_features']
+        self.max_depth = header['max_depth']
+        self.denominator = header['denominator']
+        self.offset_ = header['offset']
+        for name, _ in _ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def path_lengths(self, X):
+        """Sum over trees of each row's isolation depth (with leaf correction)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"expected rows of {self.n_features_in_} features, got shape {X.shape}")
+        node = np.broadcast_to(self.roots, (X.shape[0], self.roots.size))
+        for _ in range(self.max_depth):
+            values = np.take_along_axis(X, self.feature[node], axis=1)
+            node = np.where(values <= self.threshold[node], self.left[node], self.right[node])
+        return self.path_length[node].sum(axis=1)
+
+    def score_samples(self, X):
+        depths = self.path_lengths(X)
+        if self.denominator == 0:
+            return np.full(depths.shape, -0.5)
+        return -(2.0 ** (-depths / self.denominator))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+
+def load_forest(path):
+    """Memory-map an exported forest read-only."""
+    raw = np.memmap(path, dtype=np.uint8, mode='r').view(np.ndarray)
+    if bytes(raw[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not an exported forest")
+    (length,) = struct.unpack('<I', bytes(raw[len(MAGIC):len(MAGIC) + 4]))
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(raw[start:start + length]))
+    data_start = _aligned(start + length)
+    arrays = {}
+    for name, (dtype, shape, offset) in header['arrays'].items():
+        dtype = np.dtype(dtype)
+        offset += data_start
+        arrays[name] = raw[offset:offset + int(np.prod(shape)) * dtype.itemsize].view(dtype).reshape(shape)
+    return FlatForest(header, arrays)
+
+
+if __name__ == '__main__':
+    import joblib
+
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m inference.forest <model.joblib> <out.forest>")
+    artifact = joblib.load(sys.argv[1])
+    if isinstance(artifact, dict):
+        export_forest(artifact['model'], sys.argv[2], artifact.get('version'), artifact.get('feature_schema'))
+    else:
+        export_forest(artifact, sys.argv[2])
+    print(f"Wrote {sys.argv[2]}")
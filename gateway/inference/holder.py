@@ -0,0 +1,160 @@
+"""One IsolationForest per worker, hot-swapped when its artifact changes.
+
+The artifact is either a forest exported by ``inference.forest`` (memory
+mapped, scored without sklearn) or a joblib file holding a bare estimator or
+a dict ``{'model': estimator, 'version': str, 'feature_schema': str}``. A new file
+is loaded and warmed up off the request path; only then does a single
+reference assignment publish it, so a request always scores with exactly one
+complete model, old or new, and nothing waits on a reload.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from inference.batcher import MicroBatcher
+from inference.forest import is_flat_forest, load_forest
+from metrics import metrics
+
+LoadedModel = namedtuple('LoadedModel', 'model version feature_schema signature')
+Prediction = namedtuple('Prediction', 'label score version latency_ms')
+
+
+class ModelLoadError(Exception):
+    pass
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_version(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def _read_artifact(path):
+    """(model, version, feature_schema) from an exported forest or a joblib file."""
+    if is_flat_forest(path):
+        model = load_forest(path)
+        return model, model.version or _file_version(path), model.feature_schema
+    import joblib  # unpickling an estimator imports sklearn; exported forests avoid both
+
+    artifact = joblib.load(path)
+    if isinstance(artifact, dict):
+        return artifact['model'], artifact.get('version') or _file_version(path), artifact.get('feature_schema')
+    return artifact, _file_version(path), None
+
+
+class ModelHolder:
+    def __init__(self, path, width, feature_schema=None, poll_interval=5.0, batch_size=1, batch_wait_ms=2.0,
+                 name='model'):
+        self.path = path
+        self.name = name
+        self.width = width
+        self.feature_schema = feature_schema
+        self.poll_interval = poll_interval
+        self._current = None
+        self._failed_signature = None
+        self._stop = threading.Event()
+        self._watcher = None
+        self._watcher_pid = None
+        self._batcher = MicroBatcher(self.predict_batch, batch_size, batch_wait_ms) if batch_size > 1 else None
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def ready(self):
+        """True once a model is serving, or when no model is configured."""
+        return not self.path or self._current is not None
+
+    def load(self):
+        """Load and warm up the artifact at ``path`` and publish it."""
+        signature = _signature(self.path)
+        model, version, feature_schema = _read_artifact(self.path)
+        if feature_schema and self.feature_schema and feature_schema != self.feature_schema:
+            raise ModelLoadError(f"model {version} was trained on {feature_schema}, serving {self.feature_schema}")
+        # First call pays for lazy allocations; keep that off the request path.
+        model.predict(np.zeros((1, self.width), dtype=np.float32))
+        self._current = LoadedModel(model, str(version), feature_schema, signature)
+        metrics.incr(f'{self.name}.loads')
+        metrics.gauge(f'{self.name}.version', self._current.version)
+        print(f"Loaded model {version} from {self.path}")
+        return self._current
+
+    def reload_if_changed(self):
+        try:
+            signature = _signature(self.path)
+        except OSError:
+            return False
+        current = self._current
+        if signature == self._failed_signature or (current is not None and current.signature == signature):
+            return False
+        try:
+            self.load()
+        except Exception as e:
+            # Retried only once the file changes again (e.g. a copy that was still in progress).
+            self._failed_signature = signature
+            metrics.incr(f'{self.name}.load_failures')
+            print(f"Keeping model {current.version if current else None}: failed to load {self.path}: {e}")
+            return False
+        return True
+
+    def start(self):
+        """Load now (failing loudly if configured but unusable), then watch for changes."""
+        if not self.path:
+            return self
+        self.load()
+        return self.watch()
+
+    def watch(self):
+        """Start the watcher thread in this process (again after a fork: threads do not survive it)."""
+        if not self.path or (self._watcher is not None and self._watcher.is_alive()
+                             and self._watcher_pid == os.getpid()):
+            return self
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name=f'{self.name}-watcher', daemon=True)
+        self._watcher.start()
+        self._watcher_pid = os.getpid()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None and self._watcher_pid == os.getpid():
+            self._watcher.join()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload_if_changed()
+
+    def predict_batch(self, matrix):
+        """Score each row of ``matrix`` with one call to the current model."""
+        current = self._current
+        started = time.perf_counter()
+        # IsolationForest.predict is just the sign of decision_function; keep the score too.
+        scores = current.model.decision_function(np.asarray(matrix, dtype=np.float32))
+        latency_ms = (time.perf_counter() - started) * 1000
+        metrics.observe(f'{self.name}.inference_ms', latency_ms)
+        return [Prediction(-1 if score < 0 else 1, float(score), current.version, latency_ms) for score in scores]
+
+    def predict(self, features):
+        """Score one feature vector; None when no model is loaded.
+
+        With batching enabled the vector is scored together with those of
+        concurrent requests; ``latency_ms`` is then that shared call's time.
+        """
+        if self._current is None:
+            return None
+        features = np.asarray(features, dtype=np.float32).reshape(-1)
+        if self._batcher is not None:
+            return self._batcher.submit(features)
+        return self.predict_batch(features[np.newaxis])[0]
@@ -0,0 +1,105 @@
+"""Shadow scoring: candidate models see live traffic without deciding it.
+
+/verify hands a sampled share of its feature vectors to ``ShadowScorer``
+once its response is ready. Candidates score them on a small background
+executor and the results go to the ``ShadowScore`` collection, next to the
+serving model's own prediction, for offline comparison before promotion.
+
+Submitting never waits: when ``max_pending`` vectors are already queued the
+vector is dropped (and counted) instead.
+"""
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from inference.holder import ModelHolder
+from metrics import metrics
+from models.ShadowScore import ShadowScore
+
+
+class ShadowScorer:
+    def __init__(self, paths, width, feature_schema=None, sample_rate=1.0, workers=1, max_pending=1000,
+                 poll_interval=5.0):
+        self.feature_schema = feature_schema
+        self.sample_rate = sample_rate
+        self.candidates = [ModelHolder(path, width, feature_schema, poll_interval, name=f'shadow.{i}')
+                           for i, path in enumerate(paths or [])]
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return bool(self.candidates) and self.sample_rate > 0
+
+    def start(self):
+        for candidate in self.candidates:
+            candidate.start()
+        return self
+
+    def stop(self):
+        for candidate in self.candidates:
+            candidate.stop()
+
+    def after_fork(self):
+        """Restart background work in a freshly forked worker; the parent's threads did not come along."""
+        for candidate in self.candidates:
+            candidate.watch()
+        with self._lock:
+            self._executor = None
+        return self
+
+    def sampled(self):
+        return self.enabled and random.random() < self.sample_rate
+
+    def submit(self, features, log_id, primary=None):
+        """Queue ``features`` for the candidates; returns False if it was dropped."""
+        if not self._pending.acquire(blocking=False):
+            metrics.incr('shadow.dropped')
+            return False
+        self._ensure_executor().submit(self._score, np.array(features, dtype=np.float32), log_id, primary)
+        metrics.incr('shadow.submitted')
+        return True
+
+    def _ensure_executor(self):
+        # Created once per process, under the lock so concurrent first submits do not each start one.
+        if self._pid == os.getpid() and self._executor is not None:
+            return self._executor
+        with self._lock:
+            if self._pid != os.getpid() or self._executor is None:
+                self._executor = ThreadPoolExecutor(self._workers, thread_name_prefix='shadow')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _score(self, features, log_id, primary):
+        try:
+            scores = []
+            for candidate in self.candidates:
+                prediction = candidate.predict(features)
+                if prediction is None:
+                    continue
+                scores.append(ShadowScore(
+                    verification_log=log_id,
+                    feature_schema=self.feature_schema,
+                    primary_version=primary.version if primary else None,
+                    primary_prediction=primary.label if primary else None,
+                    primary_score=primary.score if primary else None,
+                    model_version=prediction.version,
+                    prediction=prediction.label,
+                    score=prediction.score,
+                    inference_ms=prediction.latency_ms,
+                ))
+                if primary is not None and prediction.label != primary.label:
+                    metrics.incr(f'{candidate.name}.disagreements')
+            if scores:
+                ShadowScore.objects.insert(scores, load_bulk=False)
+        except Exception as e:
+            metrics.incr('shadow.errors')
+            print("Error in shadow scoring:", e)
+        finally:
+            self._pending.release()
@@ -0,0 +1,200 @@
+"""Offline IsolationForest training over VerificationLog.
+
+Logs are streamed through a batched server-side cursor that projects only
+``model_features`` and ``is_bot``, and matches only vectors of the serving
+feature schema. Each outcome (human, bot, unknown) keeps its own
+fixed-size reservoir sample (Algorithm R) in a preallocated float32 array,
+so memory is ``strata x capacity x width`` however many logs are scanned.
+
+The forest is fitted on a share of the human reservoir. It is evaluated on
+the held-out humans (false positive rate) and on the bot reservoir
+(detection rate). The run writes ``model-<version>.forest``, which
+MODEL_PATH can point at directly, and a ``model-<version>.json`` report.
+Versions are the UTC time plus a random suffix, and a run claims its
+version by creating the report first, so runs never overwrite each other.
+
+    python -m inference.train --out models/artifacts
+    python -m inference.train --uri mongomock://localhost/greenflag   # in-memory stand-in
+"""
+import argparse
+import json
+import os
+import random
+import secrets
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from analysis.features import FeaturePipeline
+from inference.forest import export_forest
+
+STRATA = {False: 'human', True: 'bot', None: 'unknown'}
+
+
+class StratifiedReservoir:
+    """Uniform fixed-size samples of feature vectors, one per stratum."""
+
+    def __init__(self, width, capacity, seed=0):
+        self.width = width
+        self.capacity = capacity
+        self.rows = {}
+        self.seen = {}
+        self._random = random.Random(seed)
+
+    def add(self, stratum, vector):
+        rows = self.rows.get(stratum)
+        if rows is None:
+            rows = self.rows[stratum] = np.empty((self.capacity, self.width), dtype=np.float32)
+            self.seen[stratum] = 0
+        seen = self.seen[stratum]
+        self.seen[stratum] = seen + 1
+        if seen < self.capacity:
+            rows[seen] = vector
+        else:
+            slot = self._random.randrange(seen + 1)
+            if slot < self.capacity:
+                rows[slot] = vector
+
+    def sample(self, stratum):
+        if stratum not in self.rows:
+            return np.empty((0, self.width), dtype=np.float32)
+        return self.rows[stratum][:min(self.seen[stratum], self.capacity)]
+
+
+def scan_logs(collection, schema_id, width, capacity, batch_size=5000, seed=0, limit=None):
+    """Stream matching logs into a StratifiedReservoir; returns (reservoir, counters)."""
+    reservoir = StratifiedReservoir(width, capacity, seed)
+    counters = {'scanned': 0, 'wrong_width': 0}
+    cursor = collection.find(
+        {'feature_schema': schema_id, 'model_features': {'$exists': True}},
+        {'_id': 0, 'model_features': 1, 'is_bot': 1},
+        batch_size=batch_size,
+    )
+    if limit:
+        cursor = cursor.limit(limit)
+    with cursor:
+        for log in cursor:
+            counters['scanned'] += 1
+            vector = log['model_features']
+            if len(vector) != width:
+                counters['wrong_width'] += 1
+                continue
+            reservoir.add(STRATA.get(log.get('is_bot')), vector)
+    return reservoir, counters
+
+
+def _rates(model, rows):
+    if not len(rows):
+        return None
+    scores = model.decision_function(rows)
+    return {
+        'count': int(len(rows)),
+        'anomaly_rate': float(np.mean(scores < 0)),
+        'score_quantiles': {str(q): float(np.quantile(scores, q)) for q in (0.01, 0.05, 0.5, 0.95, 0.99)},
+    }
+
+
+def train(collection, out_dir, features=None, capacity=200_000, holdout=0.2, n_estimators=100,
+          max_samples='auto', contamination='auto', batch_size=5000, seed=0, limit=None):
+    """Scan, fit, evaluate and write the artifact and report; returns the report."""
+    from sklearn.ensemble import IsolationForest
+
+    features = features or FeaturePipeline()
+    started = time.monotonic()
+    reservoir, counters = scan_logs(collection, features.schema_id, features.width, capacity, batch_size, seed, limit)
+    scanned_in = time.monotonic() - started
+
+    humans = reservoir.sample('human')
+    if len(humans) < 2:
+        raise SystemExit(f"need at least 2 human logs with schema {features.schema_id}, found {len(humans)}")
+    order = np.random.default_rng(seed).permutation(len(humans))
+    held_out = int(len(humans) * holdout)
+    train_rows, eval_rows = humans[order[held_out:]], humans[order[:held_out]]
+
+    model = IsolationForest(n_estimators=n_estimators, max_samples=max_samples,
+                            contamination=contamination, random_state=seed).fit(train_rows)
+
+    os.makedirs(out_dir, exist_ok=True)
+    version, report_file = _reserve(out_dir, features.schema_id)
+    try:
+        artifact = export_forest(model, os.path.join(out_dir, f'model-{version}.forest'), version, features.schema_id)
+    except BaseException:
+        report_file.close()
+        os.remove(report_file.name)
+        raise
+    report = {
+        'version': version,
+        'artifact': artifact,
+        'feature_schema': features.schema_id,
+        'columns': list(features.columns),
+        'params': {'n_estimators': n_estimators, 'max_samples': max_samples, 'contamination': contamination,
+                   'capacity': capacity, 'holdout': holdout, 'seed': seed},
+        'logs': {**counters, 'per_stratum': dict(reservoir.seen)},
+        'sampled': {stratum: int(len(reservoir.sample(stratum))) for stratum in reservoir.rows},
+        'train_rows': int(len(train_rows)),
+        'evaluation': {
+            'human_holdout': _rates(model, eval_rows),
+            'bot': _rates(model, reservoir.sample('bot')),
+            'unknown': _rates(model, reservoir.sample('unknown')),
+        },
+        'seconds': {'scan': round(scanned_in, 3), 'total': round(time.monotonic() - started, 3)},
+    }
+    with report_file as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def _reserve(out_dir, schema_id):
+    """A version no other run uses, and its report file, created exclusively to claim it."""
+    while True:
+        version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{secrets.token_hex(3)}-{schema_id}"
+        try:
+            return version, open(os.path.join(out_dir, f'model-{version}.json'), 'x')
+        except FileExistsError:
+            continue
+
+
+def _collection(uri):
+    from models.VerificationLog import VerificationLog
+
+    if uri.startswith('mongomock://'):
+        import mongomock
+
+        client = mongomock.MongoClient('mongodb://' + uri[len('mongomock://'):])
+    else:
+        from pymongo import MongoClient
+
+        client = MongoClient(uri)
+    return client.get_default_database()[VerificationLog._get_collection_name()]
+
+
+def main(argv=None):
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--uri', default=os.getenv('MONGO_URI'), help="Mongo URI with database (mongomock:// for in-memory)")
+    parser.add_argument('--out', default='artifacts', help="directory for the artifact and report")
+    parser.add_argument('--capacity', type=int, default=200_000, help="reservoir size per stratum")
+    parser.add_argument('--holdout', type=float, default=0.2, help="share of sampled humans kept for evaluation")
+    parser.add_argument('--estimators', type=int, default=100)
+    parser.add_argument('--max-samples', default='auto')
+    parser.add_argument('--contamination', default='auto')
+    parser.add_argument('--batch-size', type=int, default=5000, help="cursor batch size")
+    parser.add_argument('--limit', type=int, help="scan at most this many logs")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if not args.uri:
+        parser.error("--uri or MONGO_URI is required")
+
+    def number(value):
+        return value if value == 'auto' else float(value) if '.' in value else int(value)
+
+    report = train(_collection(args.uri), args.out, FeaturePipeline(Config.FEATURE_EXTRACTORS), args.capacity,
+                   args.holdout, args.estimators, number(args.max_samples), number(args.contamination),
+                   args.batch_size, args.seed, args.limit)
+    print(json.dumps({key: report[key] for key in ('version', 'artifact', 'logs', 'evaluation')}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Short-lived cache of /verify outcomes.
+
+A resubmission with the same browser fingerprint and (after quantizing to
+``quantum``) the same behavior features gets the verdict already reached for
+it, without the model, the storage of its behavior data or a full log.
+Entries expire after ``ttl`` seconds; past ``max_entries`` the least
+recently used one is evicted.
+
+The key also holds a coarse tier of the fingerprint's and IP's attempts in
+the last hour (one tier per doubling). Every time either count doubles the
+cache misses, so a burst of identical resubmissions still reaches the model
+with its growing ``history`` features instead of replaying one verdict for
+the whole ``ttl``.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from metrics import metrics
+
+Verdict = namedtuple('Verdict', 'body status is_bot log_id')
+
+
+class VerdictCache:
+    def __init__(self, max_entries=10_000, ttl=60, quantum=0.01):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quantum = quantum
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, fingerprint, features, history=None):
+        """The cache key for ``features`` (the behavior columns) and the ``history`` snapshot of this request."""
+        quantized = np.rint(np.nan_to_num(np.asarray(features, dtype=np.float64)) / self.quantum).astype(np.int64)
+        history = history or {}
+        tiers = '.'.join(str(int(history.get(column, 0)).bit_length())
+                         for column in ('fingerprint_attempts_hour', 'ip_attempts_hour'))
+        return f'{fingerprint}:{tiers}:{hashlib.sha1(quantized.tobytes()).hexdigest()}'
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                metrics.incr('verdict_cache.hits')
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        metrics.incr('verdict_cache.misses')
+        return None
+
+    def put(self, key, verdict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, verdict)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.incr('verdict_cache.evictions')
+            metrics.gauge('verdict_cache.size', len(self._entries))
@@ -0,0 +1,56 @@
+"""Process-wide counters and value summaries, exposed on GET /metrics."""
+import threading
+from collections import defaultdict
+
+
+class _Summary:
+    __slots__ = ('count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def as_dict(self):
+        if not self.count:
+            return {'count': 0}
+        return {'count': self.count, 'sum': self.total, 'mean': self.total / self.count,
+                'min': self.min, 'max': self.max}
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._summaries = defaultdict(_Summary)
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value):
+        with self._lock:
+            self._summaries[name].add(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'summaries': {name: summary.as_dict() for name, summary in self._summaries.items()},
+            }
+
+
+metrics = Metrics()
@@ -0,0 +1,18 @@
+from mongoengine import Document, fields
+
+class BehaviorHistory(Document):
+    """Verifications per IP or fingerprint per minute, written by analysis.history."""
+    kind = fields.StringField()  # 'ip' or 'fingerprint'
+    key = fields.StringField()
+    bucket = fields.DateTimeField()
+    attempts = fields.IntField(default=0)
+    bots = fields.IntField(default=0)
+    fingerprints = fields.ListField(fields.StringField())  # IP documents only
+
+    meta = {
+        'collection': 'behavior_history',
+        'indexes': [
+            {'fields': ['kind', 'key', 'bucket'], 'unique': True},
+            {'fields': ['bucket'], 'expireAfterSeconds': 2 * 60 * 60}
+        ]
+    }
@@ -0,0 +1,44 @@
+from mongoengine import Document, fields
+from datetime import datetime
+
+from models.UserBehavior import DeviceInfo, GeoLocation, DeviceOrientation
+
+class BehaviorSession(Document):
+    """Header of a behavior session stored in chunks by storage.chunks."""
+    created_at = fields.DateTimeField(default=datetime.utcnow)
+    timeOnPage = fields.FloatField()
+    idleTime = fields.FloatField()
+    zoomLevel = fields.FloatField()
+    deviceInfo = fields.EmbeddedDocumentField(DeviceInfo)
+    geoLocation = fields.EmbeddedDocumentField(GeoLocation)
+    deviceOrientation = fields.EmbeddedDocumentField(DeviceOrientation)
+    browserFingerprint = fields.StringField()
+
+    # payload key -> {count, chunks, start, end, columns: {column: {min, max, mean}}}
+    channels = fields.DictField()
+    chunk_events = fields.IntField()
+
+    meta = {
+        'collection': 'behavior_sessions',
+        'indexes': [
+            'created_at',
+            'browserFingerprint'
+        ]
+    }
+
+class BehaviorChunk(Document):
+    """Up to chunk_events consecutive events of one channel, packed with storage.codec."""
+    session = fields.ReferenceField(BehaviorSession)
+    channel = fields.StringField()  # payload key, e.g. cursorData
+    seq = fields.IntField()
+    count = fields.IntField()
+    start = fields.DateTimeField()
+    end = fields.DateTimeField()
+    data = fields.BinaryField()
+
+    meta = {
+        'collection': 'behavior_chunks',
+        'indexes': [
+            {'fields': ['session', 'channel', 'seq'], 'unique': True}
+        ]
+    }
@@ -0,0 +1,13 @@
+from mongoengine import Document, fields
+
+class LogCounter(Document):
+    """Running document counts of a collection by outcome, kept by storage.totals."""
+    name = fields.StringField(primary_key=True)  # counted collection
+    total = fields.IntField(default=0)
+    bots = fields.IntField(default=0)
+    humans = fields.IntField(default=0)
+    cutoff = fields.ObjectIdField()  # logs up to this _id are in the seed; later ones are added with $inc
+
+    meta = {
+        'collection': 'log_counters'
+    }
@@ -0,0 +1,26 @@
+from mongoengine import Document, fields
+from datetime import datetime
+
+class ShadowScore(Document):
+    """A candidate model's score for a request the serving model decided."""
+    timestamp = fields.DateTimeField(default=datetime.utcnow)
+    verification_log = fields.ReferenceField('VerificationLog')
+    feature_schema = fields.StringField()
+
+    # Serving model
+    primary_version = fields.StringField()
+    primary_prediction = fields.IntField()
+    primary_score = fields.FloatField()
+
+    # Candidate model
+    model_version = fields.StringField()
+    prediction = fields.IntField()
+    score = fields.FloatField()
+    inference_ms = fields.FloatField()
+
+    meta = {
+        'indexes': [
+            'timestamp',
+            'model_version'
+        ]
+    }
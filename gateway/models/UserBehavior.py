@@ -1,5 +1,8 @@
 from mongoengine import Document, EmbeddedDocument, fields, connect
 
+from analysis.frame import CHANNEL_COLUMNS, Channel
+from storage import codec
+
 class CursorData(EmbeddedDocument):
     x = fields.FloatField()
     y = fields.FloatField()
@@ -97,3 +100,16 @@ class UserBehavior(Document):
     touchData = fields.ListField(fields.EmbeddedDocumentField(TouchData))
     dragDropData = fields.ListField(fields.EmbeddedDocumentField(DragDropData))
     browserFingerprint = fields.StringField()  # Added browser fingerprint field
+    packed = fields.DictField()  # payload key -> storage.codec bytes when BEHAVIOR_STORAGE is 'packed'
+
+    def channel(self, key):
+        """A channel's columns as a ``Channel``, whether it was stored packed or as a list."""
+        if key in self.packed:
+            return codec.channel(self.packed[key])
+        return Channel(key, [event.to_mongo() for event in self[key]], CHANNEL_COLUMNS[key])
+
+    def events(self, key):
+        """A channel as the list of event dicts it was stored as before packing."""
+        if key in self.packed:
+            return codec.event_dicts(codec.channel(self.packed[key]))
+        return [event.to_mongo().to_dict() for event in self[key]]
@@ -8,11 +8,17 @@ class MouseMetrics(EmbeddedDocument):
     max_speed = fields.FloatField()
     acceleration = fields.FloatField()
     entropy = fields.FloatField()
+    angle_entropy = fields.FloatField()
 
 class KeyboardMetrics(EmbeddedDocument):
     total_keystrokes = fields.IntField()
     average_interval = fields.FloatField()
     entropy = fields.FloatField()
+    average_dwell = fields.FloatField()
+    dwell_std = fields.FloatField()
+    average_flight = fields.FloatField()
+    flight_std = fields.FloatField()
+    rhythm_regularity = fields.FloatField()
 
 class ValidationResults(EmbeddedDocument):
     ip_valid = fields.BooleanField()
@@ -49,18 +55,27 @@ class VerificationLog(Document):
     
     # Model prediction
     model_features = fields.ListField(fields.FloatField())
+    feature_schema = fields.StringField()
     model_prediction = fields.IntField()  # -1 for anomaly, 1 for normal
+    model_version = fields.StringField()
+    inference_ms = fields.FloatField()
     
     # Final outcome
     is_bot = fields.BooleanField()
     
+    # Events dropped before analysis/storage: channel -> {received, analysed, stored}
+    payload_reduction = fields.DictField()
+
     # Additional data
     user_behavior_id = fields.ReferenceField('UserBehavior')
+    behavior_session = fields.ReferenceField('BehaviorSession')  # when BEHAVIOR_STORAGE is 'chunked'
+    cached_from = fields.ReferenceField('VerificationLog')  # verdict replayed from this log
     notes = fields.StringField()
 
     meta = {
         'indexes': [
             'timestamp',
+            ('-timestamp', '-id'),  # keyset pagination of the admin listing
             'ip_address',
             'browser_fingerprint',
             'is_bot'
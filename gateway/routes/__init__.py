@@ -2,4 +2,4 @@ from flask import Blueprint
 
 bp = Blueprint('verify', __name__)
 
-from . import verify
+from . import verify, behavior, admin
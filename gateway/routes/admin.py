@@ -0,0 +1,94 @@
+from flask import current_app, request, jsonify
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timezone
+from . import bp
+from models.VerificationLog import VerificationLog
+from storage.keyset import InvalidCursor, keyset_page, tokens
+
+# What the admin table shows; ?view=summary returns only these, the rest comes from the per-log endpoint.
+SUMMARY_FIELDS = ('timestamp', 'ip_address', 'user_agent', 'time_on_page', 'is_bot',
+                  'mouse_metrics.average_speed', 'mouse_metrics.acceleration')
+
+def serialize_log(log):
+    log_dict = log.to_mongo().to_dict()
+    for key, value in log_dict.items():
+        if isinstance(value, ObjectId):
+            log_dict[key] = str(value)
+    return log_dict
+
+def plain(value):
+    """A pymongo value made JSON-ready in one pass: ObjectIds as str, datetimes as ISO 8601 UTC, at any depth."""
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat(timespec='milliseconds') + 'Z'
+    return value
+
+@bp.route('/admin/verification-logs', methods=['GET'])
+def get_verification_logs():
+    # ?cursor=<next/prev token> seeks from the edge of the previous page; ?page=N is kept for older clients.
+    try:
+        limit = max(1, int(request.args.get('limit', 10)))
+        cursor = request.args.get('cursor')
+        if request.args.get('view') == 'summary':
+            # Projected raw dicts: no document hydration, no model_features or other detail fields.
+            queryset, serialize = VerificationLog.objects.only(*SUMMARY_FIELDS).as_pymongo(), plain
+        else:
+            queryset, serialize = VerificationLog.objects, serialize_log
+        # Cached counts (storage.totals); "exact" is false while they are only an estimate.
+        totals = current_app.extensions['totals'].snapshot()
+        total_logs = totals['total']
+
+        if cursor is not None:
+            logs, prev, next = keyset_page(queryset, limit, cursor)
+            return jsonify({
+                "limit": limit,
+                "total_logs": total_logs,
+                "totals": totals,
+                "prev": prev,
+                "next": next,
+                "logs": [serialize(log) for log in logs]
+            })
+
+        page = max(1, int(request.args.get('page', 1)))
+        skip = (page - 1) * limit
+        logs = list(queryset.order_by('-timestamp', '-id').skip(skip).limit(limit + 1))
+        prev, next = tokens(logs[:limit], page > 1, len(logs) > limit)
+
+        response = {
+            "page": page,
+            "limit": limit,
+            "total_logs": total_logs,
+            "total_pages": (total_logs + limit - 1) // limit,
+            "totals": totals,
+            "prev": prev,
+            "next": next,
+            "logs": [serialize(log) for log in logs[:limit]]
+        }
+
+        return jsonify(response)
+    except InvalidCursor as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        print("Error retrieving verification logs:", e)
+        return jsonify({"message": "An error occurred while retrieving verification logs."}), 500
+
+@bp.route('/admin/verification-logs/<log_id>', methods=['GET'])
+def get_verification_log(log_id):
+    try:
+        log = VerificationLog.objects(id=ObjectId(log_id)).as_pymongo().first()
+    except InvalidId:
+        return jsonify({"message": "Invalid log id"}), 400
+    except Exception as e:
+        print("Error retrieving verification log:", e)
+        return jsonify({"message": "An error occurred while retrieving the verification log."}), 500
+    if log is None:
+        return jsonify({"message": "Verification log not found"}), 404
+    return jsonify(plain(log))
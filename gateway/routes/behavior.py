@@ -0,0 +1,33 @@
+from flask import current_app, jsonify
+import re
+from . import bp
+from .payload import read_payload
+from analysis.wire import WireFormatError
+
+SESSION_ID = re.compile(r'^[A-Za-z0-9_-]{8,128}$')
+
+@bp.route('/behavior/<session_id>/chunk', methods=['POST'])
+def ingest_chunk(session_id):
+    if not SESSION_ID.match(session_id):
+        return jsonify({"message": "Invalid session id"}), 400
+
+    try:
+        chunk = read_payload(behavior_key=None)
+    except WireFormatError as e:
+        return jsonify({"message": f"Invalid chunk: {e}"}), 400
+    if not isinstance(chunk, dict):
+        return jsonify({"message": "Chunk must be a JSON object"}), 400
+
+    try:
+        aggregate = current_app.extensions['sessions'].get_or_create(session_id)
+        aggregate.add(chunk)
+        return jsonify({
+            "session": session_id,
+            "chunks": aggregate.chunks,
+            "events": sum(aggregate.counts.values())
+        })
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({"message": f"Invalid chunk: {e}"}), 400
+    except Exception as e:
+        print("Error ingesting behavior chunk:", e)
+        return jsonify({"message": "An error occurred while processing your request."}), 500
@@ -0,0 +1,51 @@
+from flask import current_app, jsonify, json, make_response, request, abort
+from analysis import wire
+from analysis.compression import BodyTooLarge, CorruptBody, UnsupportedEncoding, decompress, supported_encodings
+from metrics import metrics
+
+def _reject(status, reason, message):
+    metrics.incr(f'ingest.rejected.{reason}')
+    abort(make_response(jsonify({"message": message}), status))
+
+def _decoded_body(encoding):
+    body = request.get_data(cache=False)
+    try:
+        raw = decompress(body, encoding, current_app.config['MAX_DECOMPRESSED_BYTES'], current_app.config['MAX_COMPRESSION_RATIO'])
+    except UnsupportedEncoding as e:
+        _reject(415, 'encoding', f"Unsupported Content-Encoding {e}; accepted: {', '.join(supported_encodings())}")
+    except BodyTooLarge:
+        _reject(413, 'too_large', "Decompressed request body exceeds the allowed size")
+    except CorruptBody as e:
+        _reject(400, 'corrupt', f"Invalid compressed body: {e}")
+    metrics.incr('ingest.bytes.compressed', len(body))
+    metrics.incr('ingest.bytes.raw', len(raw))
+    if body:
+        metrics.observe('ingest.compression_ratio', len(raw) / len(body))
+    return raw
+
+def read_payload(behavior_key='userBehaviorData'):
+    """The request body as a dict: JSON, or the packed msgpack form (see analysis.wire).
+
+    gzip, deflate and zstd bodies (Content-Encoding) are decoded first, within
+    MAX_DECOMPRESSED_BYTES and MAX_COMPRESSION_RATIO.
+    """
+    encoding = request.headers.get('Content-Encoding', '').strip().lower()
+    # The header is client-controlled; anything not decodable is counted under one fixed name.
+    label = encoding or 'identity'
+    metrics.incr(f"ingest.requests.{label if label == 'identity' or label in supported_encodings() else 'other'}")
+    if encoding in ('', 'identity'):
+        metrics.incr('ingest.bytes.compressed', request.content_length or 0)
+        metrics.incr('ingest.bytes.raw', request.content_length or 0)
+        if wire.is_binary(request.content_type):
+            return wire.decode(request.get_data(cache=False), behavior_key)
+        return request.json
+
+    body = _decoded_body(encoding)
+    if wire.is_binary(request.content_type):
+        return wire.decode(body, behavior_key)
+    if not request.is_json:
+        _reject(415, 'content_type', "Request body must be JSON or msgpack")
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        return request.on_json_loading_failed(e)
@@ -1,21 +1,23 @@
-from flask import request, jsonify
-from bson import ObjectId
-import random
+from flask import after_this_request, current_app, request, jsonify
 from . import bp
+from .payload import read_payload
+from analysis.wire import WireFormatError
 from models.UserBehavior import UserBehavior
 from models.VerificationLog import VerificationLog, MouseMetrics, KeyboardMetrics, ValidationResults
+from analysis.frame import BehaviorFrame
+from analysis.reduce import reduce_for_analysis, simplify_for_storage
+from analysis.summaries import summary
+from inference.verdicts import Verdict
+from storage.chunks import store_session
+from storage.raw import behavior_document, encode, packed_document
 import requests
 import ipaddress
 import geoip2.database
 from user_agents import parse
-from scipy.spatial.distance import euclidean
 from datetime import datetime
 import numpy as np
-from sklearn.ensemble import IsolationForest
 from datetime import datetime, timedelta
-import joblib
 
-# model = joblib.load('path/to/your/isolation_forest_model.joblib')
 # geoip_reader = geoip2.database.Reader('path/to/your/GeoLite2-City.mmdb')
 
 def is_valid_ip(ip):
@@ -25,118 +27,59 @@ def is_valid_ip(ip):
     except ValueError:
         return False
 
-def calculate_entropy(data):
-    _, counts = np.unique(data, return_counts=True)
-    probabilities = counts / len(data)
-    return -np.sum(probabilities * np.log2(probabilities))
-
 def check_user_agent(user_agent):
     parsed_ua = parse(user_agent)
     if parsed_ua.is_bot or not parsed_ua.browser.family:
         return False
     return True
 
-def calculate_entropy(speeds):
-    # Dummy implementation, replace with actual entropy calculation
-    return np.mean(speeds) if speeds else 0
-
-def analyze_mouse_movement(cursor_data):
-    if len(cursor_data) < 2:
+def decode_behavior(session_id, user_behavior_data):
+    aggregate = current_app.extensions['sessions'].pop(session_id) if session_id else None
+    if aggregate is None:
+        return BehaviorFrame(user_behavior_data)
+    # Whatever the client had not streamed yet rides along with the submit.
+    return aggregate.add(user_behavior_data).finalize()
+
+def save_log(verification_log):
+    current_app.extensions['writer'].save(verification_log)
+    current_app.extensions['totals'].record(verification_log.pk, verification_log.is_bot)
+
+def replay_verdict(verification_log, verdict):
+    verification_log.is_bot = verdict.is_bot
+    verification_log.cached_from = verdict.log_id
+    verification_log.notes = "Cache hit"
+    save_log(verification_log)
+    return jsonify(verdict.body), verdict.status
+
+def analyze_mouse_movement(cursor):
+    if len(cursor) < 2:
         return False, MouseMetrics()
-    
-    total_distance = 0
-    total_time = 0
-    speeds = []
-    accelerations = []
-    
-    for i in range(1, len(cursor_data)):
-        start = cursor_data[i-1]
-        end = cursor_data[i]
-        
-        distance = euclidean((start['x'], start['y']), (end['x'], end['y']))
-        time_diff = (datetime.fromisoformat(end['timestamp']) - datetime.fromisoformat(start['timestamp'])).total_seconds()
-        
-        if time_diff > 0:
-            speed = distance / time_diff
-            speeds.append(speed)
-            if len(speeds) > 1:
-                acceleration = (speed - speeds[-2]) / time_diff
-                accelerations.append(acceleration)
-        
-        total_distance += distance
-        total_time += time_diff
-    
-    average_speed = total_distance / total_time if total_time > 0 else 0
-    max_speed = max(speeds) if speeds else 0
-    average_acceleration = np.mean(accelerations) if accelerations else 0
-    entropy = calculate_entropy(speeds)
-    
+
+    metrics = summary(cursor)
+    average_speed = metrics['average_speed']
+    max_speed = metrics['max_speed']
+
     mouse_movement_valid = average_speed >= 1 and average_speed <= 500 and max_speed <= 1000
     print(mouse_movement_valid)
-    mouse_metrics = MouseMetrics(
-        total_distance=total_distance,
-        total_time=total_time,
-        average_speed=average_speed,
-        max_speed=max_speed,
-        acceleration=average_acceleration,
-        entropy=entropy
-    )
+    mouse_metrics = MouseMetrics(**metrics)
     print(type(mouse_movement_valid))
     return bool(True), mouse_metrics
 
-def analyze_keyboard_input(keystroke_data):
-    # Generate base timestamp
-    # base_timestamp = datetime.utcnow()
-
-    # # Add timestamps to the keystroke_data if missing
-    # for i, keystroke in enumerate(keystroke_data):
-    #     # Increment timestamp for each keystroke
-    #     # Assuming each keystroke happens consecutively
-    #     keystroke['timestamp'] = (base_timestamp + timedelta(milliseconds=sum([k['duration'] for k in keystroke_data[:i]]))).isoformat() + "Z"
-
-    # if len(keystroke_data) < 5:
-    #     return False, {'total_keystrokes': 0, 'average_interval': 0, 'entropy': 0}
-
-    # key_press_durations = []
-    # intervals = []
-
-    # for i in range(len(keystroke_data)):
-    #     # Ensure 'keyPressDuration' and 'timestamp' keys exist before using them
-    #     if 'keyPressDuration' in keystroke_data[i]:
-    #         key_press_durations.append(keystroke_data[i]['keyPressDuration'])
-
-    #     if i < len(keystroke_data) - 1:
-    #         if 'timestamp' in keystroke_data[i] and 'timestamp' in keystroke_data[i + 1]:
-    #             # Convert timestamp strings to datetime objects
-    #             ts1 = datetime.fromisoformat(keystroke_data[i]['timestamp'].replace("Z", ""))
-    #             ts2 = datetime.fromisoformat(keystroke_data[i + 1]['timestamp'].replace("Z", ""))
-    #             intervals.append((ts2 - ts1).total_seconds() * 1000)  # Interval in milliseconds
-    #         else:
-    #             # Handle missing 'timestamp'
-    #             print(f"Missing 'timestamp' in keystrokeData at index {i}")
-
-    # if not key_press_durations or not intervals:
-    #     return False, {'total_keystrokes': 0, 'average_interval': 0, 'entropy': 0}
-
-    # entropy = calculate_entropy(key_press_durations)
-    # average_interval = np.mean(intervals) if intervals else 0
-
-    # # Return metrics as a dictionary
-    random.seed(100)
-    metrics = {
-        'total_keystrokes': len(keystroke_data),
-        'average_interval': random.random(),
-        'entropy': random.random()
-    }
-
-    # is_valid = entropy >= 1.0
-    return bool(True), {}
+def analyze_keyboard_input(keystroke):
+    # Recorded only: the client's keystroke timings are hold times (see analysis.keyboard), and gating on
+    # them rejected short passwords.
+    metrics = summary(keystroke)
+    return True, metrics
 
 
 @bp.route('/verify', methods=['POST'])
 def verify():
     try:
-        data = request.json
+        data = read_payload()
+    except WireFormatError as e:
+        return jsonify({"message": f"Invalid request body: {e}"}), 400
+
+    try:
         if data is None:
             return jsonify({"message": "No JSON data provided"}), 400
 
@@ -178,11 +121,23 @@ def verify():
                 
         if user_behavior_data is None:
             verification_log.notes = f"Failed checks: {', '.join(failed_checks)}" + " No user behavior data provided"
-            verification_log.save()
+            save_log(verification_log)
             return jsonify({"message": "No user behavior data provided"}), 400
 
+        frame = decode_behavior(data.get('sessionId'), user_behavior_data)
+        if isinstance(frame, BehaviorFrame):
+            reduction = reduce_for_analysis(frame, current_app.config['CHANNEL_CAPS'])
+        else:
+            # Streamed chunks were reduced as they arrived (analysis.session).
+            reduction = frame.reduction
+        history = current_app.extensions['history']
+        frame.history = history.snapshot(ip_address, frame.browser_fingerprint)
+        features = current_app.extensions['features']
+        model_features = features.extract(frame)
+        verification_log.feature_schema = features.schema_id
+
         # Browser Fingerprint check
-        browser_fingerprint = user_behavior_data.get('browserFingerprint')
+        browser_fingerprint = frame.browser_fingerprint
         verification_log.browser_fingerprint = browser_fingerprint
         if browser_fingerprint is None or browser_fingerprint == '':
             validation_results.fingerprint_present = False
@@ -190,9 +145,26 @@ def verify():
         else:
             validation_results.fingerprint_present = True
 
-        time_on_page = user_behavior_data.get('idleTime')
+        # Resubmission of an outcome we already reached
+        verdicts = current_app.extensions['verdicts']
+        cache_key = None
+        if verdicts.enabled and not failed_checks:
+            # Keyed on the behavior columns plus a coarse history tier: the exact history columns count this
+            # very resubmission, but a growing run of them has to reach the model again.
+            cache_key = verdicts.key(browser_fingerprint, model_features[features.behavior_columns], frame.history)
+            verdict = verdicts.get(cache_key)
+            if verdict is not None:
+                history.record(ip_address, browser_fingerprint, verdict.is_bot)
+                return replay_verdict(verification_log, verdict)
+
+        # A session stores the events it kept from every chunk, not just the tail sent with the submit.
+        storage_frame = frame if isinstance(frame, BehaviorFrame) else BehaviorFrame(frame.payload)
+        storage_payload = simplify_for_storage(storage_frame, reduction, current_app.config['STORAGE_SIMPLIFY_EPSILON'])
+        verification_log.payload_reduction = reduction
+
+        time_on_page = frame.time_on_page
         print(time_on_page)
-        idle_time = user_behavior_data.get('idleTime')
+        idle_time = frame.idle_time
         if time_on_page is None or idle_time is None:
             validation_results.session_duration_valid = False
             failed_checks.append("Missing session duration data")
@@ -204,12 +176,11 @@ def verify():
                 failed_checks.append("Suspiciously short session")
 
         # Mouse movement check
-        cursor_data = user_behavior_data.get('cursorData')
-        if cursor_data is None or len(cursor_data) == 0:
+        if len(frame.cursor) == 0:
             validation_results.mouse_movement_valid = False
             failed_checks.append("Missing mouse movement data")
         else:
-            validation_results.mouse_movement_valid, mouse_metrics = analyze_mouse_movement(cursor_data)
+            validation_results.mouse_movement_valid, mouse_metrics = analyze_mouse_movement(frame.cursor)
             if mouse_metrics:
                 verification_log.mouse_metrics = MouseMetrics(
                     total_distance=mouse_metrics.total_distance,
@@ -217,34 +188,30 @@ def verify():
                     average_speed=mouse_metrics.average_speed,
                     max_speed=mouse_metrics.max_speed,
                     acceleration=mouse_metrics.acceleration,
-                    entropy=mouse_metrics.entropy
+                    entropy=mouse_metrics.entropy,
+                    angle_entropy=mouse_metrics.angle_entropy
                 )
             if not validation_results.mouse_movement_valid:
                 failed_checks.append("Suspicious mouse movement")
 
         # Keyboard input check
-        keystroke_data = user_behavior_data.get('keystrokeData')
-        if keystroke_data is None or len(keystroke_data) == 0:
+        if len(frame.keystroke) == 0:
             validation_results.keyboard_input_valid = False
             failed_checks.append("Missing keyboard input data")
         else:
-            validation_results.keyboard_input_valid, keyboard_metrics = analyze_keyboard_input(keystroke_data)
+            validation_results.keyboard_input_valid, keyboard_metrics = analyze_keyboard_input(frame.keystroke)
             if keyboard_metrics:
-                verification_log.keyboard_metrics = KeyboardMetrics(
-                    total_keystrokes=keyboard_metrics.get('total_keystrokes', 0),
-                    average_interval=keyboard_metrics.get('average_interval', 0),
-                    entropy=keyboard_metrics.get('entropy', 0)
-                )
+                verification_log.keyboard_metrics = KeyboardMetrics(**keyboard_metrics)
             if not validation_results.keyboard_input_valid:
                 failed_checks.append("Suspicious keyboard input")
 
         # Device orientation check (for mobile devices)
-        device_info = user_behavior_data.get('deviceInfo')
+        device_info = frame.device_info
         if device_info is None:
             validation_results.device_orientation_valid = False
             failed_checks.append("Missing device info")
         elif device_info.get('deviceType') == 'mobile':
-            orientation_data = user_behavior_data.get('deviceOrientation')
+            orientation_data = frame.device_orientation
             if orientation_data is None:
                 validation_results.device_orientation_valid = False
                 failed_checks.append("Missing device orientation data for mobile device")
@@ -262,16 +229,22 @@ def verify():
         else:
             validation_results.device_orientation_valid = None  # Not applicable for non-mobile devices
 
-        # Prepare model features
-        verification_log.model_features = [
-            len(cursor_data) if cursor_data else 0,
-            len(user_behavior_data.get('clickData', [])),
-            len(keystroke_data) if keystroke_data else 0,
-            verification_log.time_on_page if hasattr(verification_log, 'time_on_page') else 0,
-            verification_log.idle_time if hasattr(verification_log, 'idle_time') else 0,
-            len(user_behavior_data.get('copyPasteData', [])),
-            user_behavior_data.get('zoomLevel', 0),
-        ]
+        # Model prediction
+        verification_log.model_features = model_features.tolist()
+
+        prediction = current_app.extensions['model'].predict(model_features)
+        if prediction is not None:
+            verification_log.model_prediction = prediction.label
+            verification_log.model_version = prediction.version
+            verification_log.inference_ms = prediction.latency_ms
+
+        shadow = current_app.extensions['shadow']
+        if shadow.sampled():
+            @after_this_request
+            def score_shadow(response):
+                # Runs once the response is built and the log saved; scoring itself is in the background.
+                shadow.submit(model_features, verification_log.id, prediction)
+                return response
 
         if failed_checks or idle_time < 3:
             verification_log.validation_results = validation_results
@@ -279,17 +252,30 @@ def verify():
             verification_log.keyboard_input_valid = False
             verification_log.notes = f"Failed checks: {', '.join(failed_checks)}"
             verification_log.is_bot = True
-            verification_log.save()
-            return jsonify({"message": f"Verification failed: {verification_log.notes}"}), 400
+            save_log(verification_log)
+            history.record(ip_address, browser_fingerprint, True)
+            body = {"message": f"Verification failed: {verification_log.notes}"}
+            if cache_key:
+                verdicts.put(cache_key, Verdict(body, 400, True, verification_log.id))
+            return jsonify(body), 400
 
         # If all checks pass
-        user_behavior = UserBehavior(**user_behavior_data)
-        user_behavior.save()
-
-        verification_log.user_behavior_id = user_behavior.id
+        writer = current_app.extensions['writer']
+        layout, level = current_app.config['BEHAVIOR_STORAGE'], current_app.config['BEHAVIOR_ZSTD_LEVEL']
+        if layout == 'chunked':
+            verification_log.behavior_session = store_session(
+                writer, storage_payload, current_app.config['BEHAVIOR_CHUNK_EVENTS'], level)
+        else:
+            user_behaviors = UserBehavior._get_collection()
+            document = (packed_document(storage_payload, level) if layout == 'packed'
+                        else behavior_document(storage_payload))
+            verification_log.user_behavior_id = writer.insert(user_behaviors, encode(user_behaviors, document))
         verification_log.validation_results = validation_results
         verification_log.is_bot = False
-        verification_log.save()
+        save_log(verification_log)
+        history.record(ip_address, browser_fingerprint, False)
+        if cache_key:
+            verdicts.put(cache_key, Verdict({}, 200, False, verification_log.id))
 
         # response = requests.post('http://localhost:4000/api/v1/test', json=data)
         return {}
@@ -298,37 +284,9 @@ def verify():
     except Exception as e:
         print("Error in verify controller:", e) 
         verification_log.notes = f"Error occurred: {str(e)}"
-        verification_log.save()
+        try:
+            # Best effort: the error may have come from the writer itself (a failed or unacknowledged batch).
+            save_log(verification_log)
+        except Exception as save_error:
+            print("Error saving verification log:", save_error)
         return jsonify({"message": "An error occurred while processing your request."}), 500
-
-@bp.route('/admin/verification-logs', methods=['GET'])
-def get_verification_logs():
-    try:
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 10))
-        print(page, limit)
-        
-        skip = (page - 1) * limit
-
-        logs = VerificationLog.objects.order_by('-timestamp').skip(skip).limit(limit)
-        total_logs = VerificationLog.objects.count()  
-
-        def serialize_log(log):
-            log_dict = log.to_mongo().to_dict()
-            for key, value in log_dict.items():
-                if isinstance(value, ObjectId):
-                    log_dict[key] = str(value)
-            return log_dict
-
-        response = {
-            "page": page,
-            "limit": limit,
-            "total_logs": total_logs,
-            "total_pages": (total_logs + limit - 1) // limit,
-            "logs": [serialize_log(log) for log in logs]
-        }
-
-        return jsonify(response)
-    except Exception as e:
-        print("Error retrieving verification logs:", e)
-        return jsonify({"message": "An error occurred while retrieving verification logs."}), 500
\ No newline at end of file
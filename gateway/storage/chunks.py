@@ -0,0 +1,140 @@
+"""Bucketed storage of behavior sessions.
+
+Instead of one ``UserBehavior`` document holding every event, a session is
+a small ``BehaviorSession`` header plus a run of ``BehaviorChunk`` documents
+per channel. Each chunk holds at most ``chunk_events`` events as one
+``storage.codec`` packed channel. No document grows with the session, and a
+reader only fetches the channels it asks for.
+
+The header keeps what listings and triage need without touching any chunk:
+the scalars (timeOnPage, deviceInfo, ...) and, per channel, the event and
+chunk counts, the time range, and min/max/mean of each numeric column.
+Chunks are written before their header, so once a header is visible its
+chunks are too (except in ``fire_and_forget`` mode).
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+from analysis.frame import CHANNELS, CHANNEL_COLUMNS, TEXT, TIME, Channel, ColumnarEvents, present_key
+from models.BehaviorSession import BehaviorChunk, BehaviorSession
+from storage.codec import column_arrays, event_dicts, pack, unpack
+from storage.raw import encode, scalar_values
+
+_ATTRIBUTES = {attribute: key for attribute, key, _ in CHANNELS}
+_SCALARS = {'time_on_page': 'timeOnPage', 'idle_time': 'idleTime', 'zoom_level': 'zoomLevel',
+            'browser_fingerprint': 'browserFingerprint', 'device_info': 'deviceInfo',
+            'geo_location': 'geoLocation', 'device_orientation': 'deviceOrientation'}
+
+
+def _moment(ms):
+    return datetime(1970, 1, 1) + timedelta(milliseconds=int(ms))
+
+
+def _channel_stats(key, arrays, chunks):
+    stats = {'count': len(next(iter(arrays.values()))), 'chunks': chunks, 'columns': {}}
+    for column, _, dtype in CHANNEL_COLUMNS[key]:
+        values = arrays[column]
+        if dtype is TIME:
+            stats['start'], stats['end'] = _moment(values.min()), _moment(values.max())
+        elif dtype is not TEXT and dtype is not np.bool_ and values.size:
+            present = values[~np.isnan(values)]
+            if present.size:
+                stats['columns'][column] = {'min': float(present.min()), 'max': float(present.max()),
+                                            'mean': float(present.mean())}
+    return stats
+
+
+def session_documents(payload, chunk_events=1000, level=3, _id=None):
+    """The header and chunk documents for a userBehaviorData payload; ``level`` is the zstd level of the chunks."""
+    header = {'_id': _id or ObjectId(), 'created_at': datetime.utcnow(), **scalar_values(payload),
+              'channels': {}, 'chunk_events': chunk_events}
+    chunks = []
+    for key, columns in CHANNEL_COLUMNS.items():
+        channel = Channel(key, payload.get(key) or [], columns)
+        if not len(channel):
+            continue
+        arrays = column_arrays(channel)
+        count = len(channel)
+        for seq, start in enumerate(range(0, count, chunk_events)):
+            stop = min(start + chunk_events, count)
+            part = {column: values[start:stop] for column, values in arrays.items()}
+            chunk = {'_id': ObjectId(), 'session': header['_id'], 'channel': key, 'seq': seq, 'count': stop - start,
+                     'data': pack(key, part, stop - start, level)}
+            if 't' in arrays:
+                chunk['start'], chunk['end'] = _moment(arrays['t'][start:stop].min()), _moment(arrays['t'][start:stop].max())
+            chunks.append(chunk)
+        header['channels'][key] = _channel_stats(key, arrays, seq + 1)
+    return header, chunks
+
+
+def store_session(writer, payload, chunk_events=1000, level=3):
+    """Write a payload as a chunked session through ``writer``; returns the header id."""
+    header, chunks = session_documents(payload, chunk_events, level)
+    sessions, chunk_collection = BehaviorSession._get_collection(), BehaviorChunk._get_collection()
+    if chunks:
+        writer.insert_many(chunk_collection, [encode(chunk_collection, chunk) for chunk in chunks])
+    return writer.insert(sessions, encode(sessions, header))
+
+
+class StoredSession:
+    """A chunked session read back, with channels fetched the first time they are used.
+
+    Attribute names follow ``BehaviorFrame`` (``session.cursor``,
+    ``session.time_on_page``, ...), so analysis code runs on it unchanged.
+    """
+
+    def __init__(self, header, chunks=None):
+        self.header = header
+        self.id = header['_id']
+        self._chunks = chunks if chunks is not None else BehaviorChunk._get_collection()
+        self._channels = {}
+        for attribute, name in _SCALARS.items():
+            setattr(self, attribute, header.get(name))
+
+    @classmethod
+    def load(cls, session_id):
+        """The session with this header id, or None."""
+        header = BehaviorSession._get_collection().find_one({'_id': ObjectId(session_id)})
+        return None if header is None else cls(header)
+
+    def __getattr__(self, attribute):
+        # Only called for attributes not set in __init__: the channels.
+        if attribute not in _ATTRIBUTES:
+            raise AttributeError(f"{self.__class__.__name__} has no attribute {attribute!r}")
+        return self.channel(_ATTRIBUTES[attribute])
+
+    def channel(self, key):
+        """The ``Channel`` for a payload key, read from its chunks on first use."""
+        if key not in self._channels:
+            self._channels[key] = self._read(key)
+        return self._channels[key]
+
+    def _read(self, key):
+        columns = CHANNEL_COLUMNS[key]
+        if not self.header.get('channels', {}).get(key, {}).get('count'):
+            return Channel(key, [], columns)
+        chunks = [unpack(chunk['data']) for chunk in
+                  self._chunks.find({'session': self.id, 'channel': key}, {'_id': 0, 'data': 1}).sort('seq', 1)]
+        arrays = {}
+        for column, _, dtype in columns:
+            parts = [chunk_arrays[column] for _, _, chunk_arrays in chunks]
+            arrays[column] = [value for part in parts for value in part] if dtype is TEXT else np.concatenate(parts)
+            masks = [chunk_arrays.get(present_key(column)) for _, _, chunk_arrays in chunks]
+            if any(mask is not None for mask in masks):
+                arrays[present_key(column)] = np.concatenate(
+                    [np.ones(count, dtype=np.bool_) if mask is None else mask for (_, count, _), mask in zip(chunks, masks)])
+        return Channel(key, ColumnarEvents(key, sum(count for _, count, _ in chunks), arrays), columns)
+
+    def channels(self, keys=None):
+        """Channels by BehaviorFrame attribute name, only those for ``keys`` (payload keys) if given."""
+        return {attribute: self.channel(key) for attribute, key in _ATTRIBUTES.items() if keys is None or key in keys}
+
+    def to_payload(self, keys=None):
+        """The userBehaviorData dict form, with only the channels for ``keys`` if given."""
+        payload = {name: self.header[name] for name in _SCALARS.values() if self.header.get(name) is not None}
+        for key in CHANNEL_COLUMNS:
+            if keys is None or key in keys:
+                payload[key] = event_dicts(self.channel(key))
+        return payload
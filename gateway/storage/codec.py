@@ -0,0 +1,224 @@
+"""Packed binary encoding of one behavior channel.
+
+Stored as a single BSON Binary instead of one subdocument per event::
+
+    b'GFPK' | version u8 | flags u8 | count u32 | body        (little-endian)
+    body:   key | column count u8 | per column: name, encoding u8, itemsize u8, length u32 | column data
+
+``key`` and names are a u8 length plus UTF-8. When ``flags`` has ZSTD set,
+the body is zstd-compressed. Column encodings:
+
+* ``DELTA``: timestamps (int64 epoch ms) and float columns holding only
+  whole numbers (pixel positions). The first value is stored as an int64
+  base, followed by the differences between consecutive values, as the
+  narrowest signed int that holds them (version 1 put the base among the
+  differences, which made every timestamp column int64).
+* ``RAW``: any other float column, as float64. NaN (a missing value) is
+  kept.
+* ``BITS``: flags, as ``np.packbits``.
+* ``MASKED_BITS``: flags of which some are missing: the ``BITS`` data, then
+  the same for a bit per event that is set when the flag is present.
+* ``DICT``: text, as a u32-length JSON list of the distinct values (null
+  included), then a code per event.
+
+Decoding gives the same arrays ``Channel`` would hold (plus, for a
+``MASKED_BITS`` column, its ``present_key`` array), so a stored channel can
+be analysed as-is; ``event_dicts`` turns it back into the event dicts
+a UserBehavior list field holds.
+"""
+import json
+import math
+import struct
+
+import numpy as np
+from mongoengine import ValidationError
+
+from analysis.frame import CHANNEL_COLUMNS, TEXT, TIME, Channel, ColumnarEvents, format_timestamps, present_key
+
+try:
+    import zstandard
+except ImportError:  # optional: channels are then stored uncompressed
+    zstandard = None
+
+MAGIC = b'GFPK'
+VERSION = 2
+VERSIONS = (1, 2)  # still decoded
+ZSTD = 0x01
+
+RAW, DELTA, BITS, DICT, MASKED_BITS = range(5)
+
+_HEAD = struct.Struct('<4sBBI')
+_COLUMN = struct.Struct('<BBI')
+_BASE = struct.Struct('<q')
+
+
+def column_arrays(channel):
+    """The channel's columns (float64, int64 ms, bool, or a list for text), each validated once.
+
+    A flag column with missing values also gets its ``present_key`` array.
+    """
+    arrays = {}
+    for column, field, dtype in CHANNEL_COLUMNS[channel.payload_key]:
+        try:
+            values = getattr(channel, column)
+        except (TypeError, ValueError) as e:
+            raise ValidationError(f"invalid {channel.payload_key}: {e}") from e
+        if dtype is TEXT:
+            for value in values:
+                if value is not None and not isinstance(value, str):
+                    raise ValidationError(f"{channel.payload_key}.{field} must be a string, got {type(value).__name__}")
+            arrays[column] = list(values)
+            continue
+        values = np.asarray(values, dtype=np.int64 if dtype is TIME else dtype)
+        if values.dtype.kind == 'f' and np.isinf(values).any():
+            raise ValidationError(f"{channel.payload_key}.{field} must be finite")
+        arrays[column] = values
+        if dtype is np.bool_:
+            if isinstance(channel.events, ColumnarEvents):
+                present = channel.events.arrays.get(present_key(column))
+            else:  # the column has False for a missing flag
+                present = np.fromiter((event.get(field) is not None for event in channel.events),
+                                      dtype=np.bool_, count=len(channel))
+            if present is not None and not present.all():
+                arrays[present_key(column)] = present
+    return arrays
+
+
+def event_dicts(channel):
+    """The channel as stored event dicts: missing values left out, timestamps as ``toISOString()`` strings."""
+    if not len(channel):
+        return []
+    arrays = column_arrays(channel)
+    fields, values = [], []
+    for column, field, dtype in CHANNEL_COLUMNS[channel.payload_key]:
+        column_values = arrays[column]
+        if dtype is TIME:
+            column_values = format_timestamps(column_values)
+        elif dtype is np.bool_:
+            column_values = column_values.tolist()
+            present = arrays.get(present_key(column))
+            if present is not None:
+                column_values = [value if has else None for value, has in zip(column_values, present.tolist())]
+        elif dtype is not TEXT:
+            column_values = [None if math.isnan(value) else value for value in column_values.tolist()]
+        fields.append(field)
+        values.append(column_values)
+    return [{field: value for field, value in zip(fields, row) if value is not None} for row in zip(*values)]
+
+
+def _name(text):
+    data = text.encode()
+    return bytes((len(data),)) + data
+
+
+def _read_name(body, offset):
+    size = body[offset]
+    return body[offset + 1:offset + 1 + size].decode(), offset + 1 + size
+
+
+def _narrowest(values):
+    low, high = (int(values.min()), int(values.max())) if values.size else (0, 0)
+    for itemsize in (1, 2, 4):
+        limit = 1 << (8 * itemsize - 1)
+        if -limit <= low and high < limit:
+            return np.dtype(f'<i{itemsize}')
+    return np.dtype('<i8')
+
+
+def _encode_column(values, dtype, present=None):
+    if dtype is TEXT:
+        table = list(dict.fromkeys(values))
+        index = {value: code for code, value in enumerate(table)}
+        codes = np.fromiter((index[value] for value in values), dtype=np.int64, count=len(values))
+        codes = codes.astype(_narrowest(codes))
+        header = json.dumps(table, separators=(',', ':')).encode()
+        return DICT, codes.itemsize, struct.pack('<I', len(header)) + header + codes.tobytes()
+    if dtype is np.bool_:
+        if present is not None:
+            return MASKED_BITS, 1, np.packbits(values).tobytes() + np.packbits(present).tobytes()
+        return BITS, 1, np.packbits(values).tobytes()
+    if dtype is TIME or (np.isfinite(values).all() and (values == np.round(values)).all()
+                         and (not values.size or np.abs(values).max() < 2 ** 53)):
+        values = values.astype(np.int64)
+        deltas = np.diff(values)
+        deltas = deltas.astype(_narrowest(deltas))
+        return DELTA, deltas.itemsize, _BASE.pack(int(values[0]) if values.size else 0) + deltas.tobytes()
+    return RAW, 8, values.astype('<f8').tobytes()
+
+
+def _decode_column(encoding, itemsize, data, count, dtype, version=VERSION):
+    if encoding == DICT:
+        (size,) = struct.unpack_from('<I', data)
+        table = json.loads(data[4:4 + size])
+        codes = np.frombuffer(data, dtype=f'<i{itemsize}', offset=4 + size, count=count)
+        return [table[code] for code in codes.tolist()]
+    if encoding == BITS:
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=count).astype(np.bool_)
+    if encoding == MASKED_BITS:
+        bits = np.frombuffer(data, dtype=np.uint8)
+        half = (count + 7) // 8
+        return (np.unpackbits(bits[:half], count=count).astype(np.bool_),
+                np.unpackbits(bits[half:], count=count).astype(np.bool_))
+    if encoding == DELTA and version == 1:
+        values = np.cumsum(np.frombuffer(data, dtype=f'<i{itemsize}', count=count), dtype=np.int64)
+        return values if dtype is TIME else values.astype(np.float64)
+    if encoding == DELTA:
+        (base,) = _BASE.unpack_from(data)
+        deltas = np.frombuffer(data, dtype=f'<i{itemsize}', offset=_BASE.size, count=max(count - 1, 0))
+        values = base + np.concatenate(([0], np.cumsum(deltas, dtype=np.int64)))[:count]
+        return values if dtype is TIME else values.astype(np.float64)
+    if encoding == RAW:
+        return np.frombuffer(data, dtype='<f8', count=count).astype(np.float64)
+    raise ValueError(f"unknown column encoding {encoding}")
+
+
+def pack(key, arrays, count, level=3):
+    """Encode ``column_arrays`` output for channel ``key``; ``level`` 0 (or no zstandard) stores it uncompressed."""
+    columns, data = [], []
+    for column, _, dtype in CHANNEL_COLUMNS[key]:
+        encoding, itemsize, encoded = _encode_column(arrays[column], dtype, arrays.get(present_key(column)))
+        columns.append(_name(column) + _COLUMN.pack(encoding, itemsize, len(encoded)))
+        data.append(encoded)
+    body = b''.join([_name(key), bytes((len(columns),)), *columns, *data])
+    flags = 0
+    if level and zstandard is not None:
+        body = zstandard.ZstdCompressor(level=level).compress(body)
+        flags |= ZSTD
+    return _HEAD.pack(MAGIC, VERSION, flags, count) + body
+
+
+def unpack(data):
+    """``(key, count, arrays)`` from ``pack`` output."""
+    data = bytes(data)
+    magic, version, flags, count = _HEAD.unpack_from(data)
+    if magic != MAGIC or version not in VERSIONS:
+        raise ValueError("not a packed behavior channel")
+    body = data[_HEAD.size:]
+    if flags & ZSTD:
+        if zstandard is None:
+            raise ValueError("packed channel is zstd-compressed and zstandard is not installed")
+        body = zstandard.ZstdDecompressor().decompress(body)
+    key, offset = _read_name(body, 0)
+    dtypes = {column: dtype for column, _, dtype in CHANNEL_COLUMNS[key]}
+    columns, offset = body[offset], offset + 1
+    schema = []
+    for _ in range(columns):
+        column, offset = _read_name(body, offset)
+        schema.append((column, *_COLUMN.unpack_from(body, offset)))
+        offset += _COLUMN.size
+    arrays = {}
+    for column, encoding, itemsize, size in schema:
+        decoded = _decode_column(encoding, itemsize, body[offset:offset + size], count, dtypes[column], version)
+        if encoding == MASKED_BITS:
+            arrays[column], arrays[present_key(column)] = decoded
+        else:
+            arrays[column] = decoded
+        offset += size
+    return key, count, arrays
+
+
+def channel(data):
+    """A ``Channel`` over a packed channel."""
+    key, count, arrays = unpack(data)
+    return Channel(key, ColumnarEvents(key, count, arrays), CHANNEL_COLUMNS[key])
+
@@ -0,0 +1,73 @@
+"""Keyset pagination over ``(timestamp, _id)``, newest first.
+
+A page is found by seeking the compound ``(timestamp, _id)`` index from
+the edge of the page before it instead of skipping, so every page costs
+the same however deep it is. The edges are handed out as opaque tokens:
+``next`` continues with older entries, ``prev`` with newer ones.
+"""
+import base64
+import binascii
+import struct
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+_TOKEN = struct.Struct('<cq12s')
+_EPOCH = datetime(1970, 1, 1)
+_OLDER, _NEWER = b'n', b'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, moment, _id):
+    ms = (moment.replace(tzinfo=None) - _EPOCH) // timedelta(milliseconds=1)
+    return base64.urlsafe_b64encode(_TOKEN.pack(direction, ms, ObjectId(_id).binary)).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """``(direction, timestamp, _id)`` from a ``next``/``prev`` token."""
+    try:
+        direction, ms, oid = _TOKEN.unpack(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, struct.error, ValueError) as e:
+        raise InvalidCursor("invalid pagination cursor") from e
+    if direction not in (_OLDER, _NEWER):
+        raise InvalidCursor("invalid pagination cursor")
+    return direction, _EPOCH + timedelta(milliseconds=ms), ObjectId(oid)
+
+
+def _edge(row):
+    return (row['timestamp'], row['_id']) if isinstance(row, dict) else (row.timestamp, row.pk)
+
+
+def _seek(direction, moment, _id):
+    if direction == _OLDER:
+        return {'timestamp': {'$lte': moment}, '$or': [{'timestamp': {'$lt': moment}}, {'_id': {'$lt': _id}}]}
+    return {'timestamp': {'$gte': moment}, '$or': [{'timestamp': {'$gt': moment}}, {'_id': {'$gt': _id}}]}
+
+
+def tokens(rows, has_newer, has_older):
+    """The ``prev``/``next`` tokens around a page of rows (documents or dicts), newest first."""
+    if not rows:
+        return None, None
+    return (encode_cursor(_NEWER, *_edge(rows[0])) if has_newer else None,
+            encode_cursor(_OLDER, *_edge(rows[-1])) if has_older else None)
+
+
+def keyset_page(queryset, limit, cursor=None):
+    """``(rows, prev, next)``: up to ``limit`` entries of ``queryset`` after ``cursor`` (the first page without one)."""
+    if cursor is None:
+        rows = list(queryset.order_by('-timestamp', '-id').limit(limit + 1))
+        return (rows[:limit], *tokens(rows[:limit], False, len(rows) > limit))
+    direction, moment, _id = decode_cursor(cursor)
+    order = ('-timestamp', '-id') if direction == _OLDER else ('+timestamp', '+id')
+    rows = list(queryset.filter(__raw__=_seek(direction, moment, _id)).order_by(*order).limit(limit + 1))
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == _OLDER:
+        return (rows, *tokens(rows, True, more))
+    if not rows:  # nothing newer any more
+        return keyset_page(queryset, limit)
+    rows.reverse()
+    return (rows, *tokens(rows, more, True))
@@ -0,0 +1,74 @@
+"""UserBehavior documents built straight from the columnar frame.
+
+``UserBehavior(**payload)`` creates and validates one EmbeddedDocument per
+event, which for a long session means tens of thousands of objects.
+``behavior_document`` validates each channel once per column instead, using
+the arrays ``Channel`` already decodes. It builds the plain document that
+``UserBehavior.to_mongo()`` would have produced; ``encode`` turns it into a
+single ``RawBSONDocument`` for a pymongo collection, which sends it as-is.
+Reads through the ``UserBehavior`` model are unchanged.
+
+Timestamps are stored in the ``toISOString()`` form, as for channels
+reduced before storage. ``packed_document`` stores the channels in the
+binary form of ``storage.codec`` instead.
+"""
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from mongoengine.errors import FieldDoesNotExist
+from pymongo.collection import Collection
+
+from analysis.frame import CHANNEL_COLUMNS, Channel
+from models.UserBehavior import UserBehavior
+from storage.codec import column_arrays, event_dicts, pack
+
+# Fields a payload may carry besides its channels; ``packed`` is written here, never taken from a client.
+_SCALARS = [name for name in UserBehavior._fields_ordered if name not in CHANNEL_COLUMNS and name not in ('id', 'packed')]
+
+
+def scalar_values(payload):
+    """The non-channel fields of a payload, validated and in stored form."""
+    unknown = set(payload) - set(CHANNEL_COLUMNS) - set(_SCALARS)
+    if unknown:
+        raise FieldDoesNotExist(f"The fields {sorted(unknown)} do not exist on the document UserBehavior")
+    values = {}
+    for name in _SCALARS:
+        value = payload.get(name)
+        if value is None:
+            continue
+        field = UserBehavior._fields[name]
+        value = field.to_python(value)
+        field.validate(value)
+        values[field.db_field] = field.to_mongo(value)
+    return values
+
+
+def behavior_document(payload, _id=None):
+    """The stored form of a userBehaviorData payload, with an ``_id``."""
+    scalars = scalar_values(payload)
+    document = {'_id': _id or ObjectId()}
+    for name in UserBehavior._fields_ordered:
+        field = UserBehavior._fields[name]
+        if name in CHANNEL_COLUMNS:
+            # Stored as [] when absent, like an unset ListField.
+            document[field.db_field] = event_dicts(Channel(name, payload.get(name) or [], CHANNEL_COLUMNS[name]))
+        elif field.db_field in scalars:
+            document[field.db_field] = scalars[field.db_field]
+    return document
+
+
+def packed_document(payload, level=3, _id=None):
+    """Like ``behavior_document``, with every non-empty channel in ``packed`` (storage.codec) instead of a list."""
+    document = {'_id': _id or ObjectId(), **scalar_values(payload), 'packed': {}}
+    for key, columns in CHANNEL_COLUMNS.items():
+        channel = Channel(key, payload.get(key) or [], columns)
+        if len(channel):
+            document['packed'][key] = pack(key, column_arrays(channel), len(channel), level)
+    return document
+
+
+def encode(collection, document):
+    """``document`` as RawBSONDocument when ``collection`` is a pymongo one (mongomock only takes dicts)."""
+    if isinstance(collection, Collection):
+        return RawBSONDocument(bson.encode(document))
+    return document
@@ -0,0 +1,164 @@
+"""Cached VerificationLog totals for the admin listing.
+
+Counting a collection that only grows, on every admin request, is a full
+count on the primary. Instead, each log /verify writes is counted in
+process (``record``). A background thread adds those counts to one
+``log_counters`` document with a single ``$inc`` every
+``refresh_interval`` seconds and reads the document back. ``snapshot()``
+answers from that copy plus this process's counts not yet written, without
+touching Mongo.
+
+The counter is seeded by the first process that finds it missing. The
+seed counts the logs up to a ``cutoff`` ObjectId ``lag`` seconds in the
+past, late enough that writes queued before it have landed, and stores the
+cutoff with the counts. Every process adds only the logs after the cutoff,
+so a log is counted either by the seed or by the process that wrote it,
+never both. Logs recorded before a process has read the cutoff are kept by
+id until it has. Until the counter exists, totals come from
+``estimated_document_count`` (collection metadata). They are reported with
+``exact: false`` and no bot/human split. Counter values are exact counts,
+except that other workers' writes appear only after their next flush, and
+logs after the cutoff written by a process that exits before it ever reads
+the counter are missed.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from metrics import metrics
+
+KEYS = ('total', 'bots', 'humans')
+
+
+def _resolve(collection):
+    return collection() if callable(collection) else collection
+
+
+def _counts(is_bot):
+    return {'total': 1, 'bots': int(is_bot is True), 'humans': int(is_bot is False)}
+
+
+class LogTotals:
+    def __init__(self, logs, counters, name, refresh_interval=10.0, lag=60.0):
+        self.logs = logs
+        self.counters = counters
+        self.name = name
+        self.refresh_interval = refresh_interval
+        self.lag = lag
+        self._cached = None
+        self._pending = dict.fromkeys(KEYS, 0)
+        self._unsorted = []  # (log id, is_bot) recorded before the cutoff was known
+        self._cutoff = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def record(self, log_id, is_bot):
+        """Count one log written by this process."""
+        with self._lock:
+            if self._cutoff is None:
+                self._unsorted.append((log_id, is_bot))
+            else:
+                self._add(log_id, is_bot)
+        self._ensure_running()
+
+    def _add(self, log_id, is_bot):
+        # Called with the lock held, once the cutoff is known; the seed already counted logs up to it.
+        if self._cutoff is False or log_id > self._cutoff:
+            for key, count in _counts(is_bot).items():
+                self._pending[key] += count
+
+    def snapshot(self):
+        """``{'total', 'bots', 'humans', 'exact'}``; bots and humans are None while only an estimate exists."""
+        if self._cached is None:
+            self.refresh()
+        self._ensure_running()
+        with self._lock:
+            cached = self._cached
+            pending = dict(self._pending)
+            for _, is_bot in self._unsorted:
+                for key, count in _counts(is_bot).items():
+                    pending[key] += count
+        values = {key: None if cached[key] is None else cached[key] + pending[key] for key in KEYS}
+        return {**values, 'exact': cached['exact']}
+
+    def refresh(self, seed=False):
+        """Write this process's counts to the counter and re-read it; ``seed`` creates a missing counter."""
+        logs, counters = _resolve(self.logs), _resolve(self.counters)
+        if self._cutoff is None:
+            counter = counters.find_one({'_id': self.name})
+            if counter is None and seed:
+                counter = self._seed(logs, counters)
+            if counter is not None:
+                self._sort(counter)
+        with self._lock:
+            pending, self._pending = self._pending, dict.fromkeys(KEYS, 0)
+        try:
+            if any(pending.values()):
+                counter = counters.find_one_and_update({'_id': self.name}, {'$inc': pending},
+                                                       return_document=ReturnDocument.AFTER)
+                if counter is None:  # removed since it was read
+                    self._requeue(pending)
+                else:
+                    metrics.incr('totals.flushed')
+            elif self._cutoff is not None:
+                counter = counters.find_one({'_id': self.name})
+            else:
+                counter = None
+        except Exception:
+            self._requeue(pending)
+            raise
+        if counter is None:
+            cached = {'total': logs.estimated_document_count(), 'bots': None, 'humans': None, 'exact': False}
+        else:
+            cached = {**{key: counter.get(key, 0) for key in KEYS}, 'exact': True}
+        with self._lock:
+            self._cached = cached
+        return cached
+
+    def _sort(self, counter):
+        # Counters seeded before cutoffs existed count every log through $inc (cutoff False).
+        with self._lock:
+            self._cutoff = counter.get('cutoff', False)
+            unsorted, self._unsorted = self._unsorted, []
+            for log_id, is_bot in unsorted:
+                self._add(log_id, is_bot)
+
+    def _requeue(self, pending):
+        with self._lock:
+            for key in KEYS:
+                self._pending[key] += pending[key]
+
+    def _seed(self, logs, counters):
+        moment = datetime.now(timezone.utc) - timedelta(seconds=self.lag)
+        cutoff = ObjectId.from_datetime(moment)
+        counted = {'_id': {'$lte': cutoff}}
+        counts = {'total': logs.count_documents(counted), 'bots': logs.count_documents({**counted, 'is_bot': True}),
+                  'humans': logs.count_documents({**counted, 'is_bot': False}), 'cutoff': cutoff}
+        # Another process may have seeded it meanwhile; the first one wins, and its cutoff is used.
+        counters.update_one({'_id': self.name}, {'$setOnInsert': counts}, upsert=True)
+        metrics.incr('totals.seeded')
+        return counters.find_one({'_id': self.name})
+
+    def _ensure_running(self):
+        # Threads do not survive fork; a preloaded app starts its refresher in each worker.
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='log-totals', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh(seed=True)
+            except Exception as e:
+                metrics.incr('totals.refresh_errors')
+                print("Error refreshing log totals:", e)
+            time.sleep(self.refresh_interval)
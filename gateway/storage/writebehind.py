@@ -0,0 +1,212 @@
+"""Write-behind persistence for documents /verify creates.
+
+``save(document)`` validates the document and gives it its ObjectId on the
+request thread (``insert``/``insert_many`` take plain documents that already
+have both), so references to it (and ids handed to the verdict cache or
+shadow scoring) are valid at once. The write itself then goes through one
+of three modes:
+
+* ``sync``: insert now, as ``Document.save()`` did.
+* ``acknowledged``: queue it and wait until its batch is acknowledged.
+  Concurrent requests share one ``insert_many`` per collection instead of
+  one round trip each.
+* ``fire_and_forget``: queue it and return. A failed batch is logged and
+  counted in ``writer.dropped``.
+
+When the bounded queue is full the write falls back to a synchronous insert
+on the request thread rather than being lost. ``close()`` drains the queue:
+it runs at interpreter exit, from gunicorn's ``worker_exit`` hook and, when
+nothing else handles it, on SIGTERM.
+"""
+import os
+import queue
+import signal
+import threading
+import time
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from metrics import metrics
+
+MODES = ('sync', 'acknowledged', 'fire_and_forget')
+_STOP = object()
+
+
+class _Write:
+    __slots__ = ('collection', 'document', 'done', 'error')
+
+    def __init__(self, collection, document, acknowledged):
+        self.collection = collection
+        self.document = document
+        self.done = threading.Event() if acknowledged else None
+        self.error = None
+
+
+class WriteBehind:
+    def __init__(self, mode='acknowledged', max_queue=10_000, batch_size=500, flush_interval_ms=0.0, workers=1,
+                 ack_timeout=10.0):
+        if mode not in MODES:
+            raise ValueError(f"unknown write mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.workers = workers
+        self.ack_timeout = ack_timeout
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def save(self, document):
+        """Persist a new mongoengine document according to ``mode``; returns it."""
+        if document.pk is None:
+            document.pk = ObjectId()
+        document.validate()
+        self.insert(document._get_collection(), document.to_mongo())
+        return document
+
+    def insert(self, collection, document):
+        """Write an already validated document that has its ``_id``, according to ``mode``; returns the id."""
+        return self.insert_many(collection, [document])[0]
+
+    def insert_many(self, collection, documents):
+        """``insert`` for several documents of one collection, waiting (if at all) once for all of them."""
+        ids = [document['_id'] for document in documents]
+        if self.mode == 'sync':
+            collection.insert_many(documents)
+            return ids
+
+        writes = [_Write(collection, document, acknowledged=self.mode == 'acknowledged') for document in documents]
+        self._ensure_running()
+        for write in writes:
+            try:
+                self._queue.put_nowait(write)
+            except queue.Full:
+                metrics.incr('writer.overflow')
+                collection.insert_one(write.document)
+                write.done = None
+        metrics.gauge('writer.queue_depth', self._queue.qsize())
+        deadline = time.monotonic() + self.ack_timeout
+        for write in writes:
+            if write.done is None:
+                continue
+            if not write.done.wait(max(0.0, deadline - time.monotonic())):
+                raise TimeoutError(f"write to {collection.name} not acknowledged after {self.ack_timeout}s")
+            if write.error is not None:
+                raise write.error
+        return ids
+
+    def _ensure_running(self):
+        # Threads do not survive fork; a preloaded app starts its flushers in each worker.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self._queue.maxsize)
+                self._threads = [threading.Thread(target=self._run, name=f'write-behind-{i}', daemon=True)
+                                 for i in range(self.workers)]
+                for thread in self._threads:
+                    thread.start()
+                self._pid = os.getpid()
+
+    def _collect(self):
+        # Takes what is queued and flushes as soon as the queue is empty; writes arriving while a batch is
+        # being inserted form the next one. A positive flush_interval lingers that long for more.
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                write = self._queue.get_nowait()
+            except queue.Empty:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    write = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if write is _STOP:
+                self._queue.put(_STOP)  # let this batch finish; stop on the next round
+                break
+            batch.append(write)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            metrics.gauge('writer.queue_depth', self._queue.qsize())
+            metrics.observe('writer.batch_size', len(batch))
+            by_collection = {}
+            for write in batch:
+                by_collection.setdefault(write.collection.full_name, []).append(write)
+            for writes in by_collection.values():
+                self._insert(writes)
+
+    def _insert(self, writes):
+        collection = writes[0].collection
+        documents = [write.document for write in writes]
+        failed = {}
+        try:
+            try:
+                collection.insert_many(documents, ordered=False)
+            except AutoReconnect:
+                time.sleep(0.5)
+                collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # 11000: already there, e.g. the first attempt landed before the connection dropped.
+            failed = {error['index']: e for error in e.details.get('writeErrors', []) if error.get('code') != 11000}
+        except Exception as e:
+            failed = dict.fromkeys(range(len(writes)), e)
+        if failed:
+            print(f"Write-behind: {len(failed)} of {len(writes)} writes to {collection.name} failed:",
+                  next(iter(failed.values())))
+        for index, write in enumerate(writes):
+            if write.done is None:
+                if index in failed:
+                    metrics.incr('writer.dropped')
+            else:
+                write.error = failed.get(index)
+                write.done.set()
+        metrics.incr('writer.written', len(writes) - len(failed))
+
+    def close(self, timeout=10.0):
+        """Write out everything queued, then stop the flush threads."""
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            self._pid = None
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        left = 0
+        while True:
+            try:
+                left += self._queue.get_nowait() is not _STOP
+            except queue.Empty:
+                break
+        if left:
+            metrics.incr('writer.dropped', left)
+            print(f"Write-behind: {left} queued writes not flushed before shutdown")
+
+
+def flush_on_sigterm(writer):
+    """Drain ``writer`` on SIGTERM unless a server (e.g. gunicorn) already handles the signal."""
+    if threading.current_thread() is not threading.main_thread() or signal.getsignal(signal.SIGTERM) != signal.SIG_DFL:
+        return False
+
+    def terminate(signum, frame):
+        writer.close()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, terminate)
+    return True
@@ -0,0 +1,60 @@
+import numpy as np
+
+from analysis.frame import CHANNEL_COLUMNS, TIME
+from storage.codec import DELTA, _COLUMN, _HEAD, _read_name, pack, unpack
+
+
+def _column_widths(data):
+    """``{column: (encoding, itemsize, length)}`` of an uncompressed ``pack`` output."""
+    body = data[_HEAD.size:]
+    _, offset = _read_name(body, 0)
+    columns, offset = body[offset], offset + 1
+    widths = {}
+    for _ in range(columns):
+        column, offset = _read_name(body, offset)
+        widths[column] = _COLUMN.unpack_from(body, offset)
+        offset += _COLUMN.size
+    return widths
+
+
+def _cursor(count, seed=0):
+    rng = np.random.default_rng(seed)
+    t = 1_717_000_000_000 + np.cumsum(rng.integers(8, 40, count))
+    return {'x': np.cumsum(rng.integers(-5, 6, count)).astype(np.float64),
+            'y': np.cumsum(rng.integers(-5, 6, count)).astype(np.float64),
+            't': t.astype(np.int64)}
+
+
+def test_timestamps_delta_encoded_narrow():
+    arrays = _cursor(5000)
+    encoding, itemsize, length = _column_widths(pack('cursorData', arrays, 5000, level=0))['t']
+    assert encoding == DELTA
+    assert itemsize == 1
+    assert length == 8 + 4999 * itemsize
+
+
+def test_delta_round_trip():
+    arrays = _cursor(5000, seed=1)
+    key, count, decoded = unpack(pack('cursorData', arrays, 5000, level=0))
+    assert (key, count) == ('cursorData', 5000)
+    for column, _, dtype in CHANNEL_COLUMNS['cursorData']:
+        np.testing.assert_array_equal(decoded[column], arrays[column])
+        assert decoded[column].dtype == (np.int64 if dtype is TIME else np.float64)
+
+
+def test_empty_and_single_event_round_trip():
+    for count in (0, 1):
+        arrays = {column: values[:count] for column, values in _cursor(3).items()}
+        _, _, decoded = unpack(pack('cursorData', arrays, count, level=0))
+        for column in arrays:
+            np.testing.assert_array_equal(decoded[column], arrays[column])
+
+
+def test_version_1_still_decodes():
+    # A version 1 DELTA column: the first value followed by the differences, all in one int64 array.
+    t = np.array([1_717_000_000_000, 1_717_000_000_016, 1_717_000_000_033], dtype=np.int64)
+    deltas = np.diff(t, prepend=np.int64(0)).astype('<i8').tobytes()
+    body = b'\x0acursorData' + bytes((1,)) + b'\x01t' + _COLUMN.pack(DELTA, 8, len(deltas)) + deltas
+    data = _HEAD.pack(b'GFPK', 1, 0, 3) + body
+    _, _, decoded = unpack(data)
+    np.testing.assert_array_equal(decoded['t'], t)
@@ -0,0 +1,69 @@
+import itertools
+import time
+
+import pytest
+from bson import ObjectId
+
+from storage.totals import LogTotals
+
+mongomock = pytest.importorskip('mongomock')
+
+_serial = itertools.count()
+
+
+def _oid(seconds_ago):
+    moment = int(time.time() - seconds_ago)
+    return ObjectId(moment.to_bytes(4, 'big') + next(_serial).to_bytes(8, 'big'))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Refreshes are driven by the test, not by background threads.
+    monkeypatch.setattr(LogTotals, '_ensure_running', lambda self: None)
+    return mongomock.MongoClient().db
+
+
+def _worker(db):
+    return LogTotals(lambda: db.logs, lambda: db.counters, 'logs', lag=60)
+
+
+def _write(db, worker, seconds_ago, is_bot):
+    log_id = _oid(seconds_ago)
+    db.logs.insert_one({'_id': log_id, 'is_bot': is_bot})
+    worker.record(log_id, is_bot)
+
+
+def _exact(db):
+    return {'total': db.logs.count_documents({}), 'bots': db.logs.count_documents({'is_bot': True}),
+            'humans': db.logs.count_documents({'is_bot': False}), 'exact': True}
+
+
+def test_seed_does_not_count_other_workers_logs_twice(db):
+    a, b = _worker(db), _worker(db)
+    for i in range(10):
+        _write(db, b, 300, i % 2 == 0)  # older than the cutoff, still pending in b
+    for i in range(5):
+        _write(db, a, 0, True)
+    for i in range(3):
+        _write(db, b, 0, False)
+    _write(db, a, 0, None)
+
+    a.refresh(seed=True)
+    b.refresh(seed=True)
+    assert a.refresh() == b.snapshot() == _exact(db)
+
+    # A worker started after the seed, and more logs from both.
+    c = _worker(db)
+    _write(db, c, 0, True)
+    c.refresh(seed=True)
+    _write(db, b, 0, False)
+    b.refresh(seed=True)
+    assert c.refresh() == b.snapshot() == _exact(db)
+
+
+def test_estimate_until_seeded(db):
+    a = _worker(db)
+    _write(db, a, 300, True)
+    assert a.snapshot()['exact'] is False
+    a.refresh(seed=True)
+    assert a.snapshot() == _exact(db)
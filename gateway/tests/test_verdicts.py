@@ -0,0 +1,36 @@
+import numpy as np
+
+from analysis.history import HistoryStore
+from inference.verdicts import Verdict, VerdictCache
+
+
+def _submit(cache, history, features, now, scored):
+    """What /verify does with a resubmission: replay a cached verdict, or score it and cache the result."""
+    snapshot = history.snapshot('203.0.113.7', 'fp-1', now=now)
+    key = cache.key('fp-1', features, snapshot)
+    verdict = cache.get(key)
+    if verdict is None:
+        scored.append(snapshot)
+        verdict = Verdict({'message': 'ok'}, 200, False, None)
+        cache.put(key, verdict)
+    history.record('203.0.113.7', 'fp-1', verdict.is_bot, now=now)
+
+
+def test_rapid_resubmissions_reach_the_model():
+    cache, history = VerdictCache(ttl=60), HistoryStore()
+    features = np.arange(8, dtype=np.float32)
+    scored = []
+    for i in range(40):
+        _submit(cache, history, features, 1_000_000.0 + i * 0.1, scored)
+    # Scored at 0, 1, 2, 4, 8, 16 and 32 earlier attempts; replayed in between.
+    assert [s['fingerprint_attempts_hour'] for s in scored] == [0, 1, 2, 4, 8, 16, 32]
+    assert scored[-1]['fingerprint_attempts_minute'] > scored[1]['fingerprint_attempts_minute']
+
+
+def test_same_history_tier_is_replayed():
+    cache = VerdictCache(ttl=60)
+    features = np.arange(8, dtype=np.float32)
+    low = {'fingerprint_attempts_hour': 5, 'ip_attempts_hour': 5}
+    high = {'fingerprint_attempts_hour': 7, 'ip_attempts_hour': 6}
+    assert cache.key('fp-1', features, low) == cache.key('fp-1', features, high)
+    assert cache.key('fp-1', features, low) != cache.key('fp-1', features, {**low, 'fingerprint_attempts_hour': 8})